@@ -4,29 +4,23 @@ CLI para procesar archivos de audio.
 Detecta pitch vocal, genera notas musicales, exporta MIDI y JSON.
 
 Uso:
-    python process_audio.py <archivo_audio>
+    python process_audio.py <archivo_audio> [<archivo_audio> ...]
     python process_audio.py tests/fixtures/audio/mi_cancion.wav
     python process_audio.py song.wav --model full --confidence 0.9
+    python process_audio.py canciones/*.wav --workers 4
 """
 
-import sys
-import json
 import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
-import torch
+from src.core.config import ModelSize, settings
 
-from src.audio.loader import load_audio, get_audio_info, AudioLoadError
-from src.audio.preprocessor import preprocess_audio, compute_frame_energy, compute_energy_threshold
-from src.audio.pitch_detector import detect_pitches
-from src.audio.pitch_post_processor import post_process_pitch
-from src.audio.note_segmenter import (
-    segment_notes, merge_same_pitch_notes, refine_onsets, filter_short_notes,
-)
-from src.audio.key_detector import filter_key_outliers, format_key_info
-from src.audio.midi_generator import generate_midi
-from src.audio.json_formatter import format_result
-from src.core.config import settings
+# Carpeta fija de resultados (relativa al directorio de trabajo)
+OUTPUT_DIR = Path("output")
 
 
 def main():
@@ -38,13 +32,20 @@ Ejemplos:
   python process_audio.py tests/fixtures/audio/song.wav
   python process_audio.py song.wav --model full
   python process_audio.py song.wav --confidence 0.9
+  python process_audio.py canciones/*.wav --workers 4
 
 Modelos disponibles:
   tiny - Rapido, menos preciso (recomendado para pruebas)
   full - Preciso, muy lento (mejor calidad)
+
+Con varios archivos en CPU se procesan en paralelo (un proceso por archivo);
+en GPU se procesan en serie reutilizando el modelo cargado.
         """,
     )
-    parser.add_argument("input_file", type=str, help="Archivo de audio a procesar")
+    parser.add_argument(
+        "input_files", type=str, nargs="+", metavar="input_file",
+        help="Archivo(s) de audio a procesar",
+    )
     parser.add_argument(
         "--model", "-m", type=str, choices=["tiny", "full"],
         default="tiny", help="Modelo TorchCREPE (default: tiny)",
@@ -53,26 +54,111 @@ Modelos disponibles:
         "--confidence", "-c", type=float, default=0.5,
         help="Umbral de confianza 0-1 (default: 0.5)",
     )
+    parser.add_argument(
+        "--batch-size", "-b", type=int, default=None,
+        help="Frames por batch de CREPE (default: 2048 en GPU, 512 en CPU)",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=None,
+        help="Procesos en paralelo con varios archivos en CPU (default: mitad de los cores)",
+    )
 
     args = parser.parse_args()
-    input_file = Path(args.input_file)
+    input_files = [Path(p) for p in args.input_files]
+
+    missing = [p for p in input_files if not p.exists()]
+    if missing:
+        for p in missing:
+            print(f"Archivo no encontrado: {p}")
+        sys.exit(1)
+
+    # torch solo cuando hay algo que procesar: --help y los errores de
+    # argumentos no pagan su tiempo de carga
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
+    if device == "cpu" and len(input_files) > 1:
+        n_workers = args.workers or max(1, (os.cpu_count() or 2) // 2)
+        n_workers = min(n_workers, len(input_files))
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(n_workers,),
+        ) as executor:
+            results = list(executor.map(
+                process_file, input_files,
+                repeat(args.model), repeat(args.confidence), repeat(args.batch_size),
+                repeat(device),
+            ))
+    else:
+        results = [
+            process_file(p, args.model, args.confidence, args.batch_size, device)
+            for p in input_files
+        ]
 
-    if not input_file.exists():
-        print(f"Archivo no encontrado: {input_file}")
+    if not all(results):
         sys.exit(1)
 
-    print("=" * 60)
-    print("Music-2-Notes - Procesador de Audio")
-    print("=" * 60)
+
+def _init_worker(n_workers: int) -> None:
+    """Reparte los threads de torch entre procesos para no sobresuscribir la CPU."""
+    import torch
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // n_workers))
+
+
+def process_file(
+    input_file: Path,
+    model: ModelSize,
+    confidence: float,
+    batch_size: int | None,
+    device: str,
+) -> bool:
+    """
+    Procesa un archivo de audio y escribe su MIDI y JSON en output/.
+
+    Returns:
+        False si el archivo no se pudo cargar, True en otro caso
+    """
+    # Imports pesados (torch, torchcrepe, librosa) diferidos; dentro de un mismo
+    # proceso solo se cargan una vez, igual que el modelo CREPE
+    from src.audio.json_formatter import format_result, save_json
+    from src.audio.key_detector import filter_key_outliers, format_key_info
+    from src.audio.loader import AudioLoadError, get_audio_info, load_audio
+    from src.audio.midi_generator import generate_midi
+    from src.audio.note_segmenter import (
+        filter_short_notes,
+        merge_same_pitch_notes,
+        refine_onsets,
+        segment_notes,
+    )
+    from src.audio.pitch_detector import detect_pitches
+    from src.audio.pitch_post_processor import post_process_pitch
+    from src.audio.preprocessor import (
+        compute_energy_threshold,
+        compute_frame_energy,
+        compute_onset_envelope,
+        preprocess_audio,
+    )
+
+    # Los bloques de varias líneas salen en un solo write: con --workers los
+    # procesos no intercalan líneas sueltas. El progreso por etapa se sigue
+    # imprimiendo al momento
+    print("\n".join(("=" * 60, "Music-2-Notes - Procesador de Audio", "=" * 60)))
 
     # 1. Info del audio
     try:
         info = get_audio_info(input_file)
-        print(f"\nArchivo: {input_file.name}")
-        print(f"Duracion: {info['duration']:.2f}s | SR: {info['sample_rate']} Hz | Canales: {info['channels']}")
+        duration = info["duration"]
+        print(
+            f"\nArchivo: {input_file.name}\n"
+            f"Duracion: {duration:.2f}s | SR: {info['sample_rate']} Hz | Canales: {info['channels']}"
+        )
     except AudioLoadError as e:
         print(f"Error cargando audio: {e}")
-        sys.exit(1)
+        return False
 
     # 2. Cargar y preprocesar
     audio, sr = load_audio(input_file, target_sr=16000, mono=True)
@@ -81,17 +167,21 @@ Modelos disponibles:
     if trim_offset > 0:
         print(f"  Silencio inicial recortado: {trim_offset:.2f}s (offset aplicado a timestamps)")
 
+    # Energia por frame: la usan el salto de silencios de CREPE y la segmentacion
+    energy = compute_frame_energy(audio, sr)
+    onset_envelope = compute_onset_envelope(audio, sr) if settings.ONSET_SPECTRAL_FLUX else None
+
     # 3. Detectar pitch con confianza real del modelo
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"\nDetectando pitch (modelo: {args.model}, device: {device})...")
-    if args.model == "full":
+    print(f"\nDetectando pitch (modelo: {model}, device: {device})...")
+    if model == "full":
         print("  Modelo 'full' puede tardar varios minutos...")
 
     frames = detect_pitches(
-        audio, sr, model_size=args.model, device=device,
-        batch_size=settings.CREPE_BATCH_SIZE,
+        audio, sr, model_size=model, device=device,
+        batch_size=batch_size,
         fmin=settings.CREPE_FMIN,
         fmax=settings.CREPE_FMAX,
+        energy=energy,
     )
     print(f"  {len(frames)} frames detectados")
 
@@ -105,20 +195,20 @@ Modelos disponibles:
     print(f"  Pitch post-procesado (median={settings.PITCH_MEDIAN_WINDOW}, vibrato={settings.VIBRATO_SMOOTH_WINDOW})")
 
     # 5. Segmentar notas con filtrado de energia y confianza
-    energy = compute_frame_energy(audio, sr)
     threshold = compute_energy_threshold(energy)
     notes = segment_notes(
         frames, energy=energy, energy_threshold=threshold,
-        confidence_threshold=args.confidence,
+        confidence_threshold=confidence,
         time_offset=trim_offset,
     )
-    print(f"  {len(notes)} notas segmentadas (confianza >= {args.confidence})")
+    print(f"  {len(notes)} notas segmentadas (confianza >= {confidence})")
 
     # 6. Post-procesar notas: merge + onset refinement + filter
     notes = merge_same_pitch_notes(notes, max_gap=settings.NOTE_MERGE_MAX_GAP)
     notes = refine_onsets(
         notes, energy=energy, time_offset=trim_offset,
         lookback_frames=settings.ONSET_LOOKBACK_FRAMES,
+        onset_envelope=onset_envelope,
     )
     notes = filter_short_notes(notes, min_duration=settings.POST_MERGE_MIN_DURATION)
     print(f"  {len(notes)} notas (post merge+onset+filter)")
@@ -127,40 +217,41 @@ Modelos disponibles:
     notes, section_keys = filter_key_outliers(notes)
     key_info = format_key_info(section_keys) if section_keys else None
     if section_keys:
-        print(f"  Tonalidad: {section_keys[0].key_name} (corr={section_keys[0].correlation:.3f})")
-        print(f"  {len(section_keys)} secciones analizadas")
+        print(
+            f"  Tonalidad: {section_keys[0].key_name} (corr={section_keys[0].correlation:.3f})\n"
+            f"  {len(section_keys)} secciones analizadas"
+        )
     print(f"  {len(notes)} notas finales (post key filter)")
 
     if not notes:
         print("\nNo se detectaron notas en el audio.")
-        sys.exit(0)
+        return True
 
-    # 5. Generar outputs
-    output_dir = Path("output")
-    output_dir.mkdir(exist_ok=True)
+    # 5. Generar outputs (OUTPUT_DIR ya existe: se crea una vez en main)
     stem = input_file.stem
 
-    midi_path = generate_midi(notes, output_dir / f"{stem}.mid")
-    print(f"\nMIDI: {midi_path}")
+    midi_path = generate_midi(notes, OUTPUT_DIR / f"{stem}.mid")
 
     result_data = format_result(
         notes=notes,
-        audio_duration=info["duration"],
-        model_size=args.model,
-        confidence_threshold=args.confidence,
+        audio_duration=duration,
+        model_size=model,
+        confidence_threshold=confidence,
         input_file=input_file.name,
         key_info=key_info,
     )
-    json_path = output_dir / f"{stem}.json"
-    with open(json_path, "w") as f:
-        json.dump(result_data, f, indent=2)
-    print(f"JSON: {json_path}")
-
-    # Resumen
-    print(f"\n{'=' * 60}")
-    print(f"Notas detectadas: {len(notes)}")
-    print(f"Duracion audio: {info['duration']:.2f}s")
-    print(f"{'=' * 60}")
+    json_path = save_json(result_data, OUTPUT_DIR / f"{stem}.json")
+
+    # Rutas + resumen
+    print("\n".join((
+        f"\nMIDI: {midi_path}",
+        f"JSON: {json_path}",
+        f"\n{'=' * 60}",
+        f"Notas detectadas: {len(notes)}",
+        f"Duracion audio: {duration:.2f}s",
+        "=" * 60,
+    )))
+    return True
 
 
 if __name__ == "__main__":
@@ -5,10 +5,13 @@ from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from src.api.v1.jobs import wait_background_tasks
+from src.api.v1.router import v1_router
 from src.core.config import settings
 from src.db.base import init_db
-from src.api.v1.router import v1_router
+from src.workers.audio_worker import close_webhook_client, shutdown_executor, warmup_executor
 
 
 @asynccontextmanager
@@ -20,8 +23,16 @@ async def lifespan(app: FastAPI):
         parents=True, exist_ok=True
     )
     await init_db()
+
+    # Arrancar el pool de procesos de los jobs; cada proceso precarga los
+    # modelos CREPE para que el primer job no pague carga/compilación
+    await warmup_executor()
     yield
-    # Shutdown: nada por ahora
+    # Shutdown: esperar a los jobs en curso (todas sus etapas, no solo la
+    # actual), luego cerrar el pool y las conexiones de webhooks
+    await wait_background_tasks()
+    await shutdown_executor()
+    await close_webhook_client()
 
 
 app = FastAPI(
@@ -32,6 +43,8 @@ app = FastAPI(
     ),
     version="0.1.0",
     lifespan=lifespan,
+    # Respuestas serializadas con orjson (el resultado de un job trae miles de notas)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS
@@ -54,3 +67,18 @@ async def root():
         "version": "0.1.0",
         "docs": "/docs",
     }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop + httptools (incluidos en uvicorn[standard]) en lugar del event
+    # loop de asyncio y el parser HTTP en Python puro
+    uvicorn.run(
+        "src.api.main:app",
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        workers=settings.API_WORKERS,
+        loop="uvloop",
+        http="httptools",
+    )
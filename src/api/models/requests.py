@@ -1,8 +1,9 @@
 """Modelos Pydantic para requests de la API."""
 
-from pydantic import BaseModel, Field
 from typing import Literal
 
+from pydantic import BaseModel, Field
+
 
 class JobOptions(BaseModel):
     model_size: Literal["tiny", "full"] = Field(
@@ -1,8 +1,9 @@
 """Modelos Pydantic para responses de la API."""
 
-from pydantic import BaseModel
 from typing import Any
 
+from pydantic import BaseModel
+
 
 class JobCreatedResponse(BaseModel):
     job_id: str
@@ -1,30 +1,30 @@
 """Endpoint de health check."""
 
+import time
 from pathlib import Path
 
 from fastapi import APIRouter
 from sqlalchemy import text
 
+from src.api.models.responses import HealthResponse
 from src.core.config import settings
 from src.db.base import async_session
-from src.api.models.responses import HealthResponse
 
 router = APIRouter(tags=["health"])
 
+# Resultado del último probe a la BD: (instante monotonic, estado). Los
+# orquestadores consultan /health cada pocos segundos; dentro del TTL se
+# responde sin abrir sesión ni conexión.
+_DB_PROBE_TTL = 1.0
+_last_db_probe: tuple[float, str] = (float("-inf"), "down")
+
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Verifica que todos los servicios estén funcionando."""
-    db_status = "up"
+    db_status = await _probe_database()
     storage_status = "up"
 
-    # Check database
-    try:
-        async with async_session() as session:
-            await session.execute(text("SELECT 1"))
-    except Exception:
-        db_status = "down"
-
     # Check storage
     storage_path = Path(settings.STORAGE_PATH)
     if not storage_path.exists():
@@ -37,3 +37,23 @@ async def health_check():
         database=db_status,
         storage=storage_status,
     )
+
+
+async def _probe_database() -> str:
+    """Ejecuta SELECT 1 contra la BD, reutilizando el resultado durante _DB_PROBE_TTL."""
+    global _last_db_probe
+
+    checked_at, db_status = _last_db_probe
+    now = time.monotonic()
+    if now - checked_at < _DB_PROBE_TTL:
+        return db_status
+
+    db_status = "up"
+    try:
+        async with async_session() as session:
+            await session.execute(text("SELECT 1"))
+    except Exception:
+        db_status = "down"
+
+    _last_db_probe = (time.monotonic(), db_status)
+    return db_status
@@ -3,16 +3,19 @@
 import asyncio
 from pathlib import Path
 
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.api.models.responses import JobCreatedResponse, JobResultResponse, JobStatusResponse
+from src.audio.loader import SUPPORTED_FORMATS
 from src.core.config import settings
+from src.core.exceptions import FileTooLargeError
 from src.db.base import get_session
+from src.db.models.job import new_job_id
 from src.db.repositories.job_repo import create_job, get_job
 from src.storage.local import storage
 from src.workers.audio_worker import process_audio_job
-from src.api.models.responses import JobCreatedResponse, JobStatusResponse, JobResultResponse
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
@@ -20,6 +23,12 @@ router = APIRouter(prefix="/jobs", tags=["jobs"])
 _background_tasks: set[asyncio.Task] = set()
 
 
+async def wait_background_tasks() -> None:
+    """Espera a que terminen los jobs lanzados por este proceso (shutdown de la API)."""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
 @router.post("", status_code=202, response_model=JobCreatedResponse)
 async def create_audio_job(
     audio_file: UploadFile = File(..., description="Archivo de audio (WAV, MP3, FLAC)"),
@@ -43,32 +52,37 @@ async def create_audio_job(
         raise HTTPException(400, "Se requiere un archivo de audio")
 
     ext = Path(audio_file.filename).suffix.lower()
-    if ext not in (".wav", ".mp3", ".flac", ".ogg", ".m4a"):
+    if ext not in SUPPORTED_FORMATS:
         raise HTTPException(422, f"Formato no soportado: {ext}")
 
-    # Leer contenido
-    content = await audio_file.read()
-
-    if len(content) > settings.MAX_AUDIO_FILE_SIZE:
-        raise HTTPException(413, "Archivo demasiado grande (máx 100MB)")
+    # Copiar el upload a storage por chunks (sin cargarlo entero en memoria).
+    # El ID se genera antes para escribir directo en la carpeta del job
+    job_id = new_job_id()
+    try:
+        file_path, size = await storage.save_upload_stream(
+            audio_file.read, job_id, audio_file.filename, settings.MAX_AUDIO_FILE_SIZE,
+        )
+    except FileTooLargeError:
+        raise HTTPException(413, "Archivo demasiado grande (máx 100MB)") from None
 
-    if len(content) == 0:
+    if size == 0:
+        await storage.discard_upload(file_path)
         raise HTTPException(400, "Archivo vacío")
 
-    # Crear job en BD
-    job = await create_job(
-        session,
-        audio_file_path="",  # Se actualiza después de guardar
-        audio_filename=audio_file.filename,
-        model_size=model_size,
-        confidence_threshold=confidence_threshold,
-        webhook_url=webhook_url,
-    )
-
-    # Guardar archivo en storage
-    file_path = await storage.save_upload(content, job.id, audio_file.filename)
-    job.audio_file_path = file_path
-    await session.commit()
+    # Crear job en BD; si el INSERT falla, el upload quedaría huérfano
+    try:
+        job = await create_job(
+            session,
+            audio_file_path=file_path,
+            audio_filename=audio_file.filename,
+            model_size=model_size,
+            confidence_threshold=confidence_threshold,
+            webhook_url=webhook_url,
+            job_id=job_id,
+        )
+    except Exception:
+        await storage.discard_upload(file_path)
+        raise
 
     # Lanzar procesamiento en background
     task = asyncio.create_task(process_audio_job(job.id))
@@ -131,7 +145,8 @@ async def download_midi(
     if job.status != "completed" or not job.midi_file_path:
         raise HTTPException(400, "MIDI no disponible aún")
 
-    path = Path(job.midi_file_path)
+    # FileResponse envía el archivo con sendfile: sin copiarlo a memoria
+    path = storage.local_path(job.midi_file_path)
     if not path.exists():
         raise HTTPException(404, "Archivo MIDI no encontrado en storage")
 
@@ -155,7 +170,8 @@ async def download_json(
     if job.status != "completed" or not job.json_file_path:
         raise HTTPException(400, "JSON no disponible aún")
 
-    path = Path(job.json_file_path)
+    # FileResponse envía el archivo con sendfile: sin copiarlo a memoria
+    path = storage.local_path(job.json_file_path)
     if not path.exists():
         raise HTTPException(404, "Archivo JSON no encontrado en storage")
 
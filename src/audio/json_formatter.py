@@ -1,14 +1,15 @@
 """Formateo de resultados en JSON."""
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 
-from src.audio.models import Note
+import orjson
+
+from src.audio.models import Note, NoteArray
 
 
 def format_result(
-    notes: list[Note],
+    notes: list[Note] | NoteArray,
     audio_duration: float,
     model_size: str,
     confidence_threshold: float,
@@ -19,7 +20,7 @@ def format_result(
     Formatea los resultados del análisis como diccionario.
 
     Args:
-        notes: Lista de notas detectadas
+        notes: Notas detectadas (lista o NoteArray)
         audio_duration: Duración del audio en segundos
         model_size: Modelo CREPE usado
         confidence_threshold: Umbral de confianza usado
@@ -42,13 +43,19 @@ def format_result(
 
     return {
         "metadata": metadata,
-        "notes": [note.to_dict() for note in notes],
+        "notes": (
+            notes.to_dicts() if isinstance(notes, NoteArray)
+            else [note.to_dict() for note in notes]
+        ),
     }
 
 
 def save_json(data: dict, output_path: str | Path) -> Path:
     """
-    Guarda resultados como archivo JSON.
+    Guarda resultados como archivo JSON (UTF-8, indentado a 2 espacios).
+
+    Usa orjson, que serializa en C y escribe bytes directamente. Acepta
+    escalares y arrays de numpy sin convertirlos antes.
 
     Args:
         data: Diccionario con los resultados
@@ -58,8 +65,10 @@ def save_json(data: dict, output_path: str | Path) -> Path:
         Path del archivo generado
     """
     output_path = Path(output_path)
+    output_path.write_bytes(serialize_result(data))
+    return output_path
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
 
-    return output_path
+def serialize_result(data: dict) -> bytes:
+    """Bytes JSON que escribe save_json (orjson, UTF-8, indentado a 2 espacios)."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,379 @@
+"""Kernels numéricos compilados con Numba para los hot paths del pipeline."""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def frame_rms(audio: np.ndarray, hop_samples: int) -> np.ndarray:
+    """
+    Energía RMS por frame en una sola pasada sobre el audio.
+
+    Cada frame eleva al cuadrado y acumula sus muestras en float64 sin crear
+    el array temporal audio ** 2; los frames se reparten entre cores.
+
+    Args:
+        audio: Muestras de audio (mono)
+        hop_samples: Muestras por frame
+
+    Returns:
+        Array float64 con len(audio) // hop_samples + 1 frames. El último es
+        parcial (o 0.0 si el audio es múltiplo del hop).
+    """
+    n_samples = audio.shape[0]
+    n_frames = n_samples // hop_samples + 1
+    energy = np.zeros(n_frames, dtype=np.float64)
+
+    for f in prange(n_frames):
+        lo = f * hop_samples
+        hi = min(lo + hop_samples, n_samples)
+        if hi <= lo:
+            continue
+        acc = 0.0
+        for i in range(lo, hi):
+            sample = float(audio[i])
+            acc += sample * sample
+        energy[f] = np.sqrt(acc / (hi - lo))
+
+    return energy
+
+
+@njit(cache=True)
+def segment_runs(
+    freqs: np.ndarray,
+    confs: np.ndarray,
+    energy: np.ndarray,
+    min_freq: float,
+    confidence_threshold: float,
+    energy_threshold: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Agrupa frames válidos consecutivos con el mismo número MIDI.
+
+    La primera pasada fusiona la máscara de validez y la conversión Hz→MIDI y
+    cuenta los segmentos; la segunda acumula las sumas por segmento
+    (frecuencia, confianza, energía) directamente en las salidas.
+
+    Args:
+        freqs: Frecuencia por frame en Hz
+        confs: Confianza por frame (0-1)
+        energy: Energía RMS por frame (puede ser más corto que freqs o vacío;
+            los frames sin energía no se filtran y aportan 0.0)
+        min_freq: Frecuencia mínima en Hz
+        confidence_threshold: Confianza mínima
+        energy_threshold: Energía mínima
+
+    Returns:
+        Tupla (midi, starts, ends, freq_sums, conf_sums, energy_sums), un
+        elemento por segmento. Cada segmento cubre los frames [start, end).
+        midi es int16 y starts/ends int32; las sumas quedan en float64 para no
+        perder precisión al acumular miles de frames. Solo se reserva un
+        buffer int16 por frame; las salidas tienen el tamaño exacto.
+    """
+    n_frames = freqs.shape[0]
+    n_energy = energy.shape[0]
+
+    # Máscara de validez sin cortocircuito: las comparaciones se evalúan
+    # siempre y se combinan con & (loops sin saltos, vectorizables). Los
+    # frames sin energía solo se filtran por frecuencia y confianza
+    valid = np.empty(n_frames, dtype=np.bool_)
+    n_checked = min(n_frames, n_energy)
+    for i in range(n_checked):
+        valid[i] = (
+            (freqs[i] > min_freq)
+            & (confs[i] >= confidence_threshold)
+            & (energy[i] > energy_threshold)
+        )
+    for i in range(n_checked, n_frames):
+        valid[i] = (freqs[i] > min_freq) & (confs[i] >= confidence_threshold)
+
+    # Pasada 1: MIDI por frame (-1 = frame inválido) y cantidad de segmentos
+    frame_midi = np.empty(n_frames, dtype=np.int16)
+    n_runs = 0
+    current = -1
+    for i in range(n_frames):
+        midi_num = -1
+        if valid[i]:
+            midi_num = int(np.rint(69.0 + 12.0 * np.log2(freqs[i] / 440.0)))
+            midi_num = max(0, min(127, midi_num))
+        frame_midi[i] = midi_num
+
+        if midi_num >= 0 and midi_num != current:
+            n_runs += 1
+        current = midi_num
+
+    # Pasada 2: sumas corridas por segmento en buffers del tamaño exacto
+    # (memoria O(segmentos), no O(frames))
+    midi = np.empty(n_runs, dtype=np.int16)
+    # Índices de frame en int32 (suficiente para >240 días a 10ms por frame)
+    starts = np.empty(n_runs, dtype=np.int32)
+    ends = np.empty(n_runs, dtype=np.int32)
+    freq_sums = np.empty(n_runs, dtype=np.float64)
+    conf_sums = np.empty(n_runs, dtype=np.float64)
+    energy_sums = np.empty(n_runs, dtype=np.float64)
+
+    # Acumuladores escalares del segmento abierto; se escriben al cerrarlo
+    run = -1
+    current = -1
+    freq_sum = 0.0
+    conf_sum = 0.0
+    energy_sum = 0.0
+    for i in range(n_frames):
+        midi_num = frame_midi[i]
+        if midi_num != current:
+            if current >= 0:
+                ends[run] = i
+                freq_sums[run] = freq_sum
+                conf_sums[run] = conf_sum
+                energy_sums[run] = energy_sum
+            if midi_num >= 0:
+                run += 1
+                midi[run] = midi_num
+                starts[run] = i
+                freq_sum = 0.0
+                conf_sum = 0.0
+                energy_sum = 0.0
+            current = midi_num
+
+        if midi_num >= 0:
+            freq_sum += freqs[i]
+            conf_sum += confs[i]
+            if i < n_energy:
+                energy_sum += energy[i]
+
+    if current >= 0:
+        ends[run] = n_frames
+        freq_sums[run] = freq_sum
+        conf_sums[run] = conf_sum
+        energy_sums[run] = energy_sum
+
+    return midi, starts, ends, freq_sums, conf_sums, energy_sums
+
+
+@njit(parallel=True, cache=True)
+def window_histograms(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    pcs: np.ndarray,
+    window_starts: np.ndarray,
+    window_seconds: float,
+) -> np.ndarray:
+    """
+    Histogramas de pitch classes ponderados por duración, uno por ventana.
+
+    Las ventanas se reparten entre cores; cada una acumula en su propia fila
+    (sin contención entre threads) y recorre solo las notas que pueden
+    solaparla. Acumular en varios histogramas privados por ventana (para no
+    encadenar sumas sobre el mismo bin) no mejora: cada ventana toca pocas
+    notas y el costo de inicializar los bancos supera la ganancia.
+
+    Args:
+        starts: Inicio de cada nota en segundos, ordenado ascendente
+        ends: Fin de cada nota en segundos
+        pcs: Pitch class (0-11) de cada nota
+        window_starts: Inicio de cada ventana en segundos
+        window_seconds: Duración de las ventanas
+
+    Returns:
+        Matriz (n_ventanas, 12) con la duración de cada pitch class dentro
+        de cada ventana
+    """
+    n_windows = window_starts.shape[0]
+    histograms = np.zeros((n_windows, 12), dtype=np.float64)
+
+    # Con inicios ordenados, las notas que pueden solapar una ventana forman
+    # un rango contiguo [lo, hi): lo sale del máximo acumulado de los fines
+    max_ends = np.empty_like(ends)
+    running = -np.inf
+    for j in range(ends.shape[0]):
+        running = max(running, ends[j])
+        max_ends[j] = running
+
+    for i in prange(n_windows):
+        w_start = window_starts[i]
+        w_end = w_start + window_seconds
+        lo = np.searchsorted(max_ends, w_start, side="right")
+        hi = np.searchsorted(starts, w_end, side="left")
+        for j in range(lo, hi):
+            weight = min(ends[j], w_end) - max(starts[j], w_start)
+            if weight > 0:
+                histograms[i, pcs[j]] += weight
+
+    return histograms
+
+
+@njit(cache=True)
+def _reflect(j: int, n: int) -> int:
+    """Índice con borde 'reflect' de scipy.ndimage (d c b a | a b c d | d c b a)."""
+    if j < 0:
+        return -j - 1
+    if j >= n:
+        return 2 * n - j - 1
+    return j
+
+
+@njit(parallel=True, cache=True)
+def smooth_pitch_segments(
+    freqs: np.ndarray,
+    seg_starts: np.ndarray,
+    seg_ends: np.ndarray,
+    median_window: int,
+    smooth_window: int,
+    std_threshold: float,
+) -> np.ndarray:
+    """
+    Filtro mediano + suavizado de vibrato de cada segmento voiced en un solo kernel.
+
+    Reproduce exactamente scipy.ndimage.median_filter y uniform_filter1d
+    (mode="reflect", misma suma corrida) seguidos del std rolling de la
+    desviación en cents, pero cada segmento se procesa de principio a fin
+    mientras está en cache, sin arrays intermedios del tamaño de la señal.
+    Los segmentos se reparten entre cores. Sin fastmath: la desviación en
+    cents ya se evalúa en la misma pasada que las sumas acumulativas, el
+    log2 no se vectoriza sin SVML y con nnan/ninf LLVM descarta el chequeo
+    isfinite, cambiando el resultado sin ganancia medible.
+
+    Args:
+        freqs: Frecuencia por frame en Hz
+        seg_starts: Inicio de cada segmento voiced
+        seg_ends: Fin (exclusivo) de cada segmento voiced
+        median_window: Ventana del filtro mediano (solo segmentos >= ventana)
+        smooth_window: Ventana del moving average (solo segmentos >= ventana)
+        std_threshold: Std en cents a partir del cual un frame es vibrato
+
+    Returns:
+        Copia de freqs con los segmentos filtrados
+    """
+    result = freqs.copy()
+
+    for k in prange(seg_starts.shape[0]):
+        start = seg_starts[k]
+        n = seg_ends[k] - start
+        segment = freqs[start:start + n].copy()
+
+        # 1. Mediana de la ventana centrada (rango size // 2, como scipy)
+        if n >= median_window:
+            half = median_window // 2
+            window = np.empty(median_window, dtype=np.float64)
+            for i in range(n):
+                # Inserción ordenada: la ventana es chica (5 frames)
+                for w in range(median_window):
+                    value = freqs[start + _reflect(i - half + w, n)]
+                    pos = w
+                    while pos > 0 and window[pos - 1] > value:
+                        window[pos] = window[pos - 1]
+                        pos -= 1
+                    window[pos] = value
+                segment[i] = window[half]
+            result[start:start + n] = segment
+
+        if n < smooth_window:
+            continue
+
+        # 2. Moving average con suma corrida (mismo orden de operaciones que scipy)
+        half = smooth_window // 2
+        smoothed = np.empty(n, dtype=np.float64)
+        total = 0.0
+        for w in range(smooth_window):
+            total += segment[_reflect(w - half, n)]
+        smoothed[0] = total / smooth_window
+        for i in range(1, n):
+            total += (
+                segment[_reflect(i + smooth_window - 1 - half, n)]
+                - segment[_reflect(i - 1 - half, n)]
+            )
+            smoothed[i] = total / smooth_window
+
+        analysis_window = smooth_window * 2
+        if n < analysis_window:
+            continue
+
+        # 3. Std rolling de la diferencia en cents con sumas acumulativas
+        cumsum = np.zeros(n + 1, dtype=np.float64)
+        cumsum2 = np.zeros(n + 1, dtype=np.float64)
+        for i in range(n):
+            cents = 1200.0 * np.log2(segment[i] / smoothed[i])
+            if not np.isfinite(cents):
+                cents = 0.0
+            cumsum[i + 1] = cumsum[i] + cents
+            cumsum2[i + 1] = cumsum2[i] + cents * cents
+
+        half = analysis_window // 2
+        for i in range(n):
+            lo = max(0, i - half)
+            hi = min(n, i + half + 1)
+            count = hi - lo
+            mean = (cumsum[hi] - cumsum[lo]) / count
+            variance = (cumsum2[hi] - cumsum2[lo]) / count - mean * mean
+            if np.sqrt(max(0.0, variance)) > std_threshold:
+                result[start + i] = smoothed[i]
+            else:
+                result[start + i] = segment[i]
+
+    return result
+
+
+@njit(cache=True)
+def encode_midi_events(
+    delta_ticks: np.ndarray,
+    kinds: np.ndarray,
+    pitches: np.ndarray,
+    velocities: np.ndarray,
+) -> np.ndarray:
+    """
+    Codifica eventos note_on/note_off (canal 0) como bytes de un track SMF.
+
+    Cada evento es su delta time como cantidad de longitud variable (7 bits
+    por byte, del grupo más significativo al menos, con el bit alto encendido
+    en todos menos el último) seguido del status y los dos bytes de datos.
+    Con running status, el status se omite cuando repite el del evento
+    anterior. La primera pasada mide el track y la segunda lo escribe, así que
+    el buffer de salida tiene el tamaño exacto.
+
+    Args:
+        delta_ticks: Delta time de cada evento en ticks (>= 0)
+        kinds: Tipo de cada evento (0 = note_off, 1 = note_on)
+        pitches: Número MIDI de cada evento
+        velocities: Velocity de cada evento
+
+    Returns:
+        Array uint8 con los eventos codificados
+    """
+    n_events = delta_ticks.shape[0]
+
+    # Pasada 1: tamaño total
+    size = 0
+    previous = -1
+    for i in range(n_events):
+        n_bytes = 1
+        while delta_ticks[i] >= 1 << (7 * n_bytes):
+            n_bytes += 1
+        size += n_bytes + 2
+        if kinds[i] != previous:
+            size += 1
+            previous = kinds[i]
+
+    # Pasada 2: bytes
+    data = np.empty(size, dtype=np.uint8)
+    pos = 0
+    previous = -1
+    for i in range(n_events):
+        delta = delta_ticks[i]
+        n_bytes = 1
+        while delta >= 1 << (7 * n_bytes):
+            n_bytes += 1
+        for k in range(n_bytes - 1, 0, -1):
+            data[pos] = ((delta >> (7 * k)) & 0x7F) | 0x80
+            pos += 1
+        data[pos] = delta & 0x7F
+        pos += 1
+
+        if kinds[i] != previous:
+            data[pos] = 0x90 if kinds[i] == 1 else 0x80
+            pos += 1
+            previous = kinds[i]
+        data[pos] = pitches[i]
+        data[pos + 1] = velocities[i]
+        pos += 2
+
+    return data
@@ -4,17 +4,16 @@ from dataclasses import dataclass
 
 import numpy as np
 
+from src.audio.kernels import window_histograms
 from src.audio.models import Note
 from src.core.config import settings
-
+from src.utils.converters import PITCH_CLASSES
 
 # Krumhansl-Kessler key profiles.
 # Índice 0 = tónica. Fuente: Krumhansl, "Cognitive Foundations of Musical Pitch" (1990).
 MAJOR_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
 MINOR_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
 
-_NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-
 # Grados diatónicos (offsets en semitonos desde la tónica)
 _MAJOR_SCALE = {0, 2, 4, 5, 7, 9, 11}
 _MINOR_SCALE = {0, 2, 3, 5, 7, 8, 10}  # menor natural
@@ -53,8 +52,22 @@ def detect_section_keys(
     if not notes:
         return []
 
-    song_start = notes[0].start_time
-    song_end = notes[-1].end_time
+    # Notas en columnas (SoA): el solapamiento con cada ventana se calcula
+    # sobre arrays en lugar de recorrer los objetos Note
+    n_notes = len(notes)
+    starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=n_notes)
+    ends = np.fromiter((n.end_time for n in notes), dtype=np.float64, count=n_notes)
+    pcs = np.fromiter((n.midi_number % 12 for n in notes), dtype=np.uint8, count=n_notes)
+
+    # El kernel de histogramas requiere inicios ordenados
+    if np.any(starts[1:] < starts[:-1]):
+        order = np.argsort(starts, kind="stable")
+        starts, ends, pcs = starts[order], ends[order], pcs[order]
+
+    # La canción termina con el fin más tardío, que no siempre es el de la
+    # última nota (una nota larga puede seguir sonando bajo las siguientes)
+    song_start = float(starts[0])
+    song_end = float(ends.max())
     total_duration = song_end - song_start
 
     if total_duration <= 0:
@@ -64,74 +77,97 @@ def detect_section_keys(
     if step <= 0:
         step = window_seconds
 
+    # Inicios de ventana en un buffer pre-dimensionado: cumsum suma paso a paso
+    # en orden (misma acumulación que recorrer la canción con w_start += step)
+    # y el margen de 2 cubre el redondeo de la división
+    n_windows = int(total_duration // step) + 2
+    window_starts = np.full(n_windows, step, dtype=np.float64)
+    window_starts[0] = song_start
+    np.cumsum(window_starts, out=window_starts)
+    window_starts = window_starts[:np.count_nonzero(window_starts < song_end)]
+
+    # Histograma ponderado por duración de cada ventana (kernel compilado)
+    histograms = window_histograms(starts, ends, pcs, window_starts, window_seconds)
+
+    # Solo analizar ventanas con suficiente material; todas en un solo GEMM
+    analyzed = np.flatnonzero(histograms.sum(axis=1) > 0.1)
+    tonics, mode_idx, correlations = _find_best_keys(histograms[analyzed])
+
     sections: list[SectionKey] = []
-    w_start = song_start
-
-    while w_start < song_end:
-        w_end = w_start + window_seconds
-
-        # Construir histograma ponderado por duración dentro de la ventana
-        histogram = np.zeros(12, dtype=np.float64)
-
-        for note in notes:
-            if note.start_time >= w_end or note.end_time <= w_start:
-                continue
-            # Duración de la nota dentro de la ventana
-            overlap_start = max(note.start_time, w_start)
-            overlap_end = min(note.end_time, w_end)
-            weight = overlap_end - overlap_start
-            if weight > 0:
-                pc = note.midi_number % 12
-                histogram[pc] += weight
-
-        # Solo analizar si hay suficiente material
-        if histogram.sum() > 0.1:
-            tonic, mode, corr = _find_best_key(histogram)
-            key_name = f"{_NOTE_NAMES[tonic]} {mode}"
-            sections.append(SectionKey(
-                start_time=w_start,
-                end_time=min(w_end, song_end),
-                key_name=key_name,
-                tonic=tonic,
-                mode=mode,
-                correlation=corr,
-            ))
-
-        w_start += step
+    for w_start, tonic, m, corr in zip(
+        window_starts[analyzed].tolist(), tonics.tolist(), mode_idx.tolist(), correlations,
+        strict=True,
+    ):
+        sections.append(SectionKey(
+            start_time=w_start,
+            end_time=min(w_start + window_seconds, song_end),
+            key_name=_KEY_NAMES[2 * tonic + m],
+            tonic=tonic,
+            mode=_KEY_MODES[m],
+            correlation=corr,
+        ))
 
     return sections
 
 
-def _find_best_key(histogram: np.ndarray) -> tuple[int, str, float]:
+def _build_key_profiles() -> np.ndarray:
     """
-    Encuentra la mejor tonalidad para un histograma de pitch classes.
-
-    Prueba los 24 keys posibles (12 tónicas × 2 modos), calcula la correlación
-    de Pearson con cada perfil rotado, y retorna el mejor.
+    Construye la matriz (24, 12) de perfiles rotados, centrados y normalizados.
 
-    Returns:
-        (tonic, mode, correlation) donde correlation está normalizado a 0-1
+    Fila 2*tónica es el perfil mayor y 2*tónica + 1 el menor de esa tónica
+    (el mismo orden en que se prueban los keys, para desempatar igual).
     """
-    best_tonic = 0
-    best_mode = "major"
-    best_corr = -2.0
-
+    profiles = np.empty((24, 12), dtype=np.float64)
     for tonic in range(12):
-        for mode, profile in [("major", MAJOR_PROFILE), ("minor", MINOR_PROFILE)]:
+        for mode_idx, profile in enumerate((MAJOR_PROFILE, MINOR_PROFILE)):
             # Rotar el perfil para que índice 0 alinee con la tónica candidata
-            rotated = np.array([profile[(i - tonic) % 12] for i in range(12)])
-            # Correlación de Pearson
-            corr = np.corrcoef(histogram, rotated)[0, 1]
-            if np.isnan(corr):
-                continue
-            if corr > best_corr:
-                best_corr = corr
-                best_tonic = tonic
-                best_mode = mode
+            profiles[2 * tonic + mode_idx] = np.roll(profile, tonic)
+    profiles -= profiles.mean(axis=1, keepdims=True)
+    profiles /= np.linalg.norm(profiles, axis=1, keepdims=True)
+    return profiles
+
+
+_KEY_PROFILES = _build_key_profiles()
+_KEY_MODES = ("major", "minor")
+
+# Nombre precomputado de cada key, en el orden de las filas de _KEY_PROFILES
+# (índice 2*tónica + modo): "C major", "C minor", "C# major", ...
+_KEY_NAMES = tuple(f"{PITCH_CLASSES[tonic]} {mode}" for tonic in range(12) for mode in _KEY_MODES)
+
+
+def _find_best_keys(histograms: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Encuentra la mejor tonalidad para cada histograma de pitch classes.
+
+    Prueba los 24 keys posibles (12 tónicas × 2 modos): con los perfiles ya
+    centrados y normalizados, la correlación de Pearson con cada uno es un
+    producto punto, así que las de todas las ventanas salen de un solo
+    producto de matrices (n_ventanas, 12) @ (12, 24).
+
+    Args:
+        histograms: Matriz (n_ventanas, 12) de histogramas de pitch classes
+
+    Returns:
+        (tonics, mode_indices, correlations), un elemento por histograma.
+        mode_indices indexa _KEY_MODES; correlations está normalizado a 0-1
+    """
+    # Centrar y normalizar en el mismo buffer (una sola copia de los histogramas)
+    centered = histograms - histograms.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum("ij,ij->i", centered, centered))
+    # Histograma plano: la correlación no está definida para ningún key
+    flat = norms == 0
+    norms[flat] = 1.0
+    centered /= norms[:, None]
+
+    corrs = centered @ _KEY_PROFILES.T
+    best = np.argmax(corrs, axis=1)
+    best_corrs = corrs.max(axis=1)
+    best[flat] = 0
+    best_corrs[flat] = -2.0
 
     # Normalizar correlación de [-1, 1] a [0, 1]
-    normalized = (best_corr + 1.0) / 2.0
-    return best_tonic, best_mode, round(normalized, 4)
+    normalized = np.round((best_corrs + 1.0) / 2.0, 4)
+    return best // 2, best % 2, normalized
 
 
 def _build_extended_scale(tonic: int, mode: str) -> set[int]:
@@ -150,6 +186,17 @@ def _build_extended_scale(tonic: int, mode: str) -> set[int]:
     return extended
 
 
+# Escala extendida de cada key como máscara de 12 bits (bit pc = pitch class
+# permitido): fila 0 = mayor, fila 1 = menor, columna = tónica
+_SCALE_MASKS = np.array(
+    [
+        [sum(1 << pc for pc in _build_extended_scale(tonic, mode)) for tonic in range(12)]
+        for mode in _KEY_MODES
+    ],
+    dtype=np.uint16,
+)
+
+
 def filter_key_outliers(
     notes: list[Note],
     window_seconds: float = settings.KEY_WINDOW_SECONDS,
@@ -186,42 +233,47 @@ def filter_key_outliers(
     if not section_keys:
         return notes, []
 
-    filtered: list[Note] = []
-
-    for note in notes:
-        # Encontrar la sección con mayor correlación que cubre esta nota
-        best_section: SectionKey | None = None
-        best_corr = -1.0
-
-        for sk in section_keys:
-            if note.start_time < sk.end_time and note.end_time > sk.start_time:
-                if sk.correlation > best_corr:
-                    best_corr = sk.correlation
-                    best_section = sk
-
-        if best_section is None:
-            # Nota fuera de todas las secciones — mantener
-            filtered.append(note)
-            continue
-
-        allowed = _build_extended_scale(best_section.tonic, best_section.mode)
-        pc = note.midi_number % 12
-
-        # Triple condición: solo eliminar si TODAS se cumplen
-        is_tonal_outlier = pc not in allowed
-        is_short = note.duration < max_duration
-        is_low_confidence = note.confidence < max_confidence
-
-        if is_tonal_outlier and is_short and is_low_confidence:
-            continue  # Eliminar
-        else:
-            filtered.append(note)
-
+    # Notas y secciones en columnas: todas las condiciones se evalúan como
+    # máscaras sobre la matriz (notas × secciones) en lugar de un doble loop
+    n_notes = len(notes)
+    starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=n_notes)
+    durations = np.fromiter((n.duration for n in notes), dtype=np.float64, count=n_notes)
+    confidences = np.fromiter((n.confidence for n in notes), dtype=np.float64, count=n_notes)
+    pcs = np.fromiter((n.midi_number % 12 for n in notes), dtype=np.uint16, count=n_notes)
+    ends = starts + durations
+
+    section_starts = np.array([sk.start_time for sk in section_keys], dtype=np.float64)
+    section_ends = np.array([sk.end_time for sk in section_keys], dtype=np.float64)
+    section_corrs = np.array([sk.correlation for sk in section_keys], dtype=np.float64)
+    section_masks = np.array(
+        [_SCALE_MASKS[_KEY_MODES.index(sk.mode), sk.tonic] for sk in section_keys],
+        dtype=np.uint16,
+    )
+
+    # Sección con mayor correlación que cubre cada nota (empate: la primera)
+    overlaps = (starts[:, None] < section_ends) & (ends[:, None] > section_starts)
+    covered = overlaps.any(axis=1)
+    best = np.argmax(np.where(overlaps, section_corrs, -np.inf), axis=1)
+
+    # Triple condición: solo eliminar si TODAS se cumplen. Las notas fuera de
+    # todas las secciones se mantienen
+    is_tonal_outlier = ((section_masks[best] >> pcs) & 1) == 0
+    is_short = durations < max_duration
+    is_low_confidence = confidences < max_confidence
+    remove = covered & is_tonal_outlier & is_short & is_low_confidence
+
+    filtered = [notes[i] for i in np.flatnonzero(~remove).tolist()]
     return filtered, section_keys
 
 
 def format_key_info(section_keys: list[SectionKey]) -> list[dict]:
     """Convierte secciones de key a dicts serializables para JSON."""
+    # Las correlaciones son escalares numpy: redondearlas todas en una sola
+    # llamada (mismo resultado que round() sobre cada una) y emitir floats
+    correlations = np.round(
+        np.fromiter((sk.correlation for sk in section_keys), dtype=np.float64, count=len(section_keys)),
+        3,
+    ).tolist()
     return [
         {
             "start_time": round(sk.start_time, 2),
@@ -229,7 +281,7 @@ def format_key_info(section_keys: list[SectionKey]) -> list[dict]:
             "key": sk.key_name,
             "tonic": sk.tonic,
             "mode": sk.mode,
-            "correlation": round(sk.correlation, 3),
+            "correlation": correlation,
         }
-        for sk in section_keys
+        for sk, correlation in zip(section_keys, correlations, strict=True)
     ]
@@ -3,11 +3,15 @@ Módulo para cargar y validar archivos de audio.
 """
 
 from pathlib import Path
-from typing import Tuple
 
 import librosa
+import mutagen
 import numpy as np
 import soundfile as sf
+import soxr
+
+# Extensiones aceptadas (la API valida los uploads con la misma lista)
+SUPPORTED_FORMATS = (".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac")
 
 
 class AudioLoadError(Exception):
@@ -22,7 +26,7 @@ def load_audio(
     mono: bool = True,
     duration: float | None = None,
     offset: float = 0.0,
-) -> Tuple[np.ndarray, int]:
+) -> tuple[np.ndarray, int]:
     """
     Carga un archivo de audio y lo convierte al formato requerido.
 
@@ -52,22 +56,29 @@ def load_audio(
         raise AudioLoadError(f"Archivo no encontrado: {file_path}")
 
     # Validar extensión
-    supported_formats = [".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac"]
-    if file_path.suffix.lower() not in supported_formats:
+    if file_path.suffix.lower() not in SUPPORTED_FORMATS:
         raise AudioLoadError(
             f"Formato no soportado: {file_path.suffix}. "
-            f"Formatos soportados: {', '.join(supported_formats)}"
+            f"Formatos soportados: {', '.join(SUPPORTED_FORMATS)}"
         )
 
     try:
-        # Cargar audio con librosa (maneja múltiples formatos)
-        audio, sr = librosa.load(
-            str(file_path),
-            sr=target_sr,
-            mono=mono,
-            duration=duration,
-            offset=offset,
-        )
+        native_sr = _native_sample_rate(file_path)
+        if native_sr is not None:
+            # Formato legible por soundfile (WAV/FLAC/OGG...): leer float32 solo
+            # el rango pedido y resamplear con soxr (mismo "soxr_hq" que librosa)
+            audio, sr = _read_native(file_path, native_sr, mono, duration, offset)
+            if sr != target_sr:
+                audio, sr = _resample(audio, sr, target_sr, mono), target_sr
+        else:
+            # Cargar audio con librosa (MP3/M4A/AAC vía audioread, resamplea)
+            audio, sr = librosa.load(
+                str(file_path),
+                sr=target_sr,
+                mono=mono,
+                duration=duration,
+                offset=offset,
+            )
 
         # Validar que se cargó algo
         if len(audio) == 0:
@@ -85,9 +96,43 @@ def load_audio(
         return audio, sr
 
     except librosa.LibrosaError as e:
-        raise AudioLoadError(f"Error al cargar audio con librosa: {e}")
+        raise AudioLoadError(f"Error al cargar audio con librosa: {e}") from e
     except Exception as e:
-        raise AudioLoadError(f"Error inesperado al cargar audio: {e}")
+        raise AudioLoadError(f"Error inesperado al cargar audio: {e}") from e
+
+
+def _native_sample_rate(file_path: Path) -> int | None:
+    """Sample rate del archivo según soundfile (None si no lo puede leer)."""
+    try:
+        return sf.info(str(file_path)).samplerate
+    except Exception:
+        return None
+
+
+def _read_native(
+    file_path: Path,
+    sr: int,
+    mono: bool,
+    duration: float | None,
+    offset: float,
+) -> tuple[np.ndarray, int]:
+    """Lee el audio con soundfile en float32, con el mismo layout que librosa.load."""
+    start = int(round(offset * sr))
+    frames = -1 if duration is None else int(round(duration * sr))
+    data, sr = sf.read(
+        str(file_path), start=start, frames=frames, dtype="float32", always_2d=True,
+    )
+    if mono:
+        return data.mean(axis=1), sr
+    # librosa devuelve (canales, muestras); mono si el archivo tiene un canal
+    return (data[:, 0] if data.shape[1] == 1 else np.ascontiguousarray(data.T)), sr
+
+
+def _resample(audio: np.ndarray, sr: int, target_sr: int, mono: bool) -> np.ndarray:
+    """Resamplea con soxr (calidad HQ); multicanal en layout (canales, muestras)."""
+    if mono or audio.ndim == 1:
+        return soxr.resample(audio, sr, target_sr, quality="HQ")
+    return np.ascontiguousarray(soxr.resample(audio.T, sr, target_sr, quality="HQ").T)
 
 
 def get_audio_info(file_path: str | Path) -> dict:
@@ -116,10 +161,13 @@ def get_audio_info(file_path: str | Path) -> dict:
     if not file_path.exists():
         raise AudioLoadError(f"Archivo no encontrado: {file_path}")
 
+    # Usar soundfile para obtener info rápidamente (solo lee la cabecera)
     try:
-        # Usar soundfile para obtener info rápidamente
         info = sf.info(str(file_path))
+    except Exception:
+        info = None
 
+    if info is not None:
         return {
             "duration": info.duration,
             "sample_rate": info.samplerate,
@@ -128,19 +176,22 @@ def get_audio_info(file_path: str | Path) -> dict:
             "subtype": info.subtype,
         }
 
+    # Fallback a mutagen (MP3/M4A/AAC): solo lee cabeceras, nunca decodifica
+    # el audio completo para validar
+    try:
+        audio_file = mutagen.File(str(file_path))
     except Exception as e:
-        # Fallback a librosa si soundfile falla
-        try:
-            duration = librosa.get_duration(path=str(file_path))
-            return {
-                "duration": duration,
-                "sample_rate": None,  # No disponible sin cargar
-                "channels": None,
-                "format": file_path.suffix,
-                "subtype": None,
-            }
-        except Exception as e2:
-            raise AudioLoadError(f"Error obteniendo info del audio: {e2}")
+        raise AudioLoadError(f"Error obteniendo info del audio: {e}") from e
+    if audio_file is None or audio_file.info is None:
+        raise AudioLoadError(f"Error obteniendo info del audio: formato no reconocido ({file_path.suffix})")
+
+    return {
+        "duration": audio_file.info.length,
+        "sample_rate": getattr(audio_file.info, "sample_rate", None),
+        "channels": getattr(audio_file.info, "channels", None),
+        "format": file_path.suffix,
+        "subtype": None,
+    }
 
 
 def validate_audio_file(file_path: str | Path, max_duration: float = 600) -> None:
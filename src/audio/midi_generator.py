@@ -1,15 +1,22 @@
 """Generación de archivos MIDI a partir de notas detectadas."""
 
+import struct
 from pathlib import Path
 
-import mido
-from mido import MidiFile, MidiTrack, Message, MetaMessage
+import numpy as np
 
-from src.audio.models import Note
+from src.audio.kernels import encode_midi_events
+from src.audio.models import Note, NoteArray
+
+# Partes fijas del Standard MIDI File, armadas una sola vez al importar
+_HEADER = struct.Struct(">4sIHHH")  # MThd, largo 6, formato, n° de tracks, ticks por beat
+_CHUNK_HEADER = struct.Struct(">4sI")  # MTrk, largo del track
+_SET_TEMPO = b"\x00\xff\x51\x03"  # delta 0 + meta set_tempo (3 bytes de datos)
+_END_OF_TRACK = b"\x00\xff\x2f\x00"  # delta 0 + meta end_of_track
 
 
 def generate_midi(
-    notes: list[Note],
+    notes: list[Note] | NoteArray,
     output_path: str | Path,
     tempo: int = 120,
     ticks_per_beat: int = 480,
@@ -20,7 +27,7 @@ def generate_midi(
     Usa delta time correcto para mantener el timing del audio original.
 
     Args:
-        notes: Lista de notas detectadas
+        notes: Notas detectadas (lista o NoteArray)
         output_path: Ruta donde guardar el archivo MIDI
         tempo: BPM del archivo MIDI (default: 120)
         ticks_per_beat: Resolución MIDI (default: 480)
@@ -29,47 +36,89 @@ def generate_midi(
         Path del archivo MIDI generado
     """
     output_path = Path(output_path)
+    output_path.write_bytes(build_midi(notes, tempo, ticks_per_beat))
+    return output_path
 
-    mid = MidiFile(ticks_per_beat=ticks_per_beat)
-    track = MidiTrack()
-    mid.tracks.append(track)
-
-    # Tempo
-    track.append(MetaMessage("set_tempo", tempo=mido.bpm2tempo(tempo), time=0))
-
-    # Crear eventos MIDI ordenados por tiempo
-    events = []
-    for note in notes:
-        events.append({
-            "time": note.start_time,
-            "type": "note_on",
-            "note": note.midi_number,
-            "velocity": note.velocity,
-        })
-        events.append({
-            "time": note.end_time,
-            "type": "note_off",
-            "note": note.midi_number,
-            "velocity": 0,
-        })
-
-    events.sort(key=lambda x: (x["time"], x["type"] == "note_on"))
 
-    # Convertir a delta ticks
-    ticks_per_second = ticks_per_beat * (tempo / 60.0)
-    last_tick = 0
+def build_midi(
+    notes: list[Note] | NoteArray,
+    tempo: int = 120,
+    ticks_per_beat: int = 480,
+) -> bytes:
+    """
+    Construye en memoria el archivo MIDI de generate_midi, sin escribirlo.
 
-    for event in events:
-        absolute_tick = int(event["time"] * ticks_per_second)
-        delta_tick = max(0, absolute_tick - last_tick)
+    Para callers que guardan el resultado por su cuenta (ej: el worker, a
+    través del storage).
 
-        track.append(Message(
-            event["type"],
-            note=event["note"],
-            velocity=event["velocity"],
-            time=delta_tick,
-        ))
-        last_tick = absolute_tick
+    Args:
+        notes: Notas detectadas (lista o NoteArray)
+        tempo: BPM del archivo MIDI (default: 120)
+        ticks_per_beat: Resolución MIDI (default: 480)
 
-    mid.save(output_path)
-    return output_path
+    Returns:
+        Bytes del Standard MIDI File
+    """
+    # Eventos MIDI como columnas separadas (SoA): primero los note_off de todas
+    # las notas, luego los note_on. Cada columna se ordena con un solo gather
+    # contiguo, sin registros intercalados
+    starts, ends, pitches, velocities = _event_columns(notes)
+    n_notes = len(starts)
+
+    # Ordenar por tiempo; el sort estable ya deja note_off antes que note_on a
+    # igual tiempo (van primero), sin clave de desempate
+    times = np.concatenate((ends, starts))
+    order = np.argsort(times, kind="stable")
+    is_note_on = order >= n_notes
+    note_index = order - n_notes * is_note_on
+
+    event_times = times[order]
+    event_kinds = is_note_on.view(np.uint8)
+    event_pitches = pitches[note_index].astype(np.uint8)
+    event_velocities = np.where(is_note_on, velocities[note_index], 0).astype(np.uint8)
+
+    # Convertir a delta ticks
+    ticks_per_second = ticks_per_beat * (tempo / 60.0)
+    absolute_ticks = (event_times * ticks_per_second).astype(np.int64)
+    delta_ticks = np.maximum(np.diff(absolute_ticks, prepend=0), 0)
+
+    # Track: tempo, eventos y end_of_track (todo en delta 0 salvo los eventos)
+    microseconds_per_beat = int(round(60 * 1e6 / tempo))
+    track = b"".join((
+        _SET_TEMPO,
+        microseconds_per_beat.to_bytes(3, "big"),
+        encode_midi_events(delta_ticks, event_kinds, event_pitches, event_velocities).tobytes(),
+        _END_OF_TRACK,
+    ))
+
+    # Formato 1 con un solo track (lo mismo que escribe mido.MidiFile)
+    return b"".join((
+        _HEADER.pack(b"MThd", 6, 1, 1, ticks_per_beat),
+        _CHUNK_HEADER.pack(b"MTrk", len(track)),
+        track,
+    ))
+
+
+def _event_columns(
+    notes: list[Note] | NoteArray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Extrae solo las columnas que usa el MIDI: (inicio, fin, pitch, velocity).
+
+    Con una lista de notas no se construye el NoteArray completo (frecuencia,
+    confianza y energía no hacen falta aquí).
+    """
+    if isinstance(notes, NoteArray):
+        return (
+            notes.start_time,
+            notes.end_time,
+            notes.midi_number.astype(np.int64),
+            notes.velocity.astype(np.int64),
+        )
+
+    n_notes = len(notes)
+    starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=n_notes)
+    durations = np.fromiter((n.duration for n in notes), dtype=np.float64, count=n_notes)
+    pitches = np.fromiter((n.midi_number for n in notes), dtype=np.int64, count=n_notes)
+    velocities = np.fromiter((n.velocity for n in notes), dtype=np.int64, count=n_notes)
+    return starts, starts + durations, pitches, velocities
@@ -2,18 +2,21 @@
 Modelos de datos para representar información de audio y notas musicales.
 """
 
+import math
 from dataclasses import dataclass
-from typing import Optional
 
 import numpy as np
 
+from src.core.config import settings
+from src.utils.converters import MIDI_NOTE_NAMES_ARRAY
+
 
 def _energy_to_velocity(
     energy: float,
-    min_vel: int = 30,
-    max_vel: int = 120,
-    db_min: float = -46.0,
-    db_max: float = -6.0,
+    min_vel: int = settings.VELOCITY_MIN,
+    max_vel: int = settings.VELOCITY_MAX,
+    db_min: float = settings.VELOCITY_DB_MIN,
+    db_max: float = settings.VELOCITY_DB_MAX,
 ) -> int:
     """
     Mapea RMS energy a MIDI velocity usando escala logarítmica (dB).
@@ -24,19 +27,37 @@ def _energy_to_velocity(
     if energy <= 0:
         return min_vel
 
-    db = 20.0 * np.log10(max(energy, 1e-10))
+    # math.log10 sobre un float: sin el dispatch de ufunc de NumPy por nota.
+    # Los clamps son comparaciones inline (se evalúan por nota): sin llamadas
+    # a los builtins min/max
+    db = 20.0 * math.log10(energy if energy > 1e-10 else 1e-10)
     normalized = (db - db_min) / (db_max - db_min)
-    normalized = max(0.0, min(1.0, normalized))
+    if normalized < 0.0:
+        normalized = 0.0
+    elif normalized > 1.0:
+        normalized = 1.0
 
     velocity = int(min_vel + normalized * (max_vel - min_vel))
-    return max(0, min(127, velocity))
+    return 127 if velocity > 127 else 0 if velocity < 0 else velocity
 
 
-@dataclass
+def _default_velocity(confidence: float, energy: float | None) -> int:
+    """Velocity de una nota: preferir energía RMS, fallback a confidence."""
+    if energy is not None and energy > 0:
+        return _energy_to_velocity(energy)
+    # Acotada a 127: Note.unchecked no valida la confianza
+    velocity = int(confidence * 77 + 50)
+    return 127 if velocity > 127 else velocity
+
+
+@dataclass(slots=True)
 class PitchFrame:
     """
     Representa un frame individual de detección de pitch.
 
+    Usa __slots__: se crea una instancia por frame (100 por segundo de audio),
+    así que cada una evita su __dict__.
+
     Attributes:
         time: Timestamp en segundos desde el inicio del audio
         frequency: Frecuencia detectada en Hz
@@ -60,9 +81,53 @@ class PitchFrame:
 
 
 @dataclass
+class PitchTrack:
+    """
+    Pitch frames en formato columnar (Structure-of-Arrays): un array por campo.
+
+    Es lo que recorre el pipeline entre la detección y la segmentación: los
+    pasos trabajan directamente sobre los arrays, sin un objeto PitchFrame
+    por frame (100 por segundo de audio).
+
+    Attributes:
+        time: Timestamps en segundos (float64)
+        frequency: Frecuencias en Hz (float64, 0 = sin pitch)
+        confidence: Confianzas del modelo (float64, 0.0 - 1.0)
+    """
+
+    time: np.ndarray
+    frequency: np.ndarray
+    confidence: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @classmethod
+    def from_frames(cls, frames: list[PitchFrame]) -> "PitchTrack":
+        """Construye la vista columnar a partir de una lista de PitchFrame."""
+        n_frames = len(frames)
+        return cls(
+            time=np.fromiter((f.time for f in frames), dtype=np.float64, count=n_frames),
+            frequency=np.fromiter((f.frequency for f in frames), dtype=np.float64, count=n_frames),
+            confidence=np.fromiter((f.confidence for f in frames), dtype=np.float64, count=n_frames),
+        )
+
+    def to_frames(self) -> list[PitchFrame]:
+        """Materializa los frames como objetos PitchFrame."""
+        # map con varios iterables recorre las columnas en C (posicional:
+        # time, frequency, confidence), sin el loop de la comprensión
+        return list(map(
+            PitchFrame, self.time.tolist(), self.frequency.tolist(), self.confidence.tolist(),
+        ))
+
+
+@dataclass(slots=True, frozen=True)
 class Note:
     """
-    Representa una nota musical detectada en el audio.
+    Representa una nota musical detectada en el audio (inmutable, con __slots__).
+
+    Los pasos de post-procesamiento crean notas nuevas en lugar de modificar
+    las existentes, así que las listas filtradas pueden compartir instancias.
 
     Attributes:
         midi_number: Número de nota MIDI (0-127)
@@ -81,8 +146,8 @@ class Note:
     duration: float
     frequency: float
     confidence: float
-    velocity: Optional[int] = None
-    energy: Optional[float] = None
+    velocity: int | None = None
+    energy: float | None = None
 
     def __post_init__(self):
         """Validar rangos y calcular velocity."""
@@ -101,17 +166,50 @@ class Note:
                 f"confidence debe estar entre 0 y 1, recibido: {self.confidence}"
             )
 
-        # Calcular velocity: preferir energia RMS, fallback a confidence
-        if self.velocity is None:
-            if self.energy is not None and self.energy > 0:
-                self.velocity = _energy_to_velocity(self.energy)
-            else:
-                self.velocity = int(self.confidence * 77 + 50)
+        # Calcular velocity (la clase es frozen: el valor derivado se asigna
+        # con object.__setattr__)
+        velocity = (
+            self.velocity
+            if self.velocity is not None
+            else _default_velocity(self.confidence, self.energy)
+        )
+        if not 0 <= velocity <= 127:
+            raise ValueError(f"velocity debe estar entre 0 y 127, recibido: {velocity}")
+        object.__setattr__(self, "velocity", velocity)
 
-        if not 0 <= self.velocity <= 127:
-            raise ValueError(
-                f"velocity debe estar entre 0 y 127, recibido: {self.velocity}"
-            )
+    @classmethod
+    def unchecked(
+        cls,
+        midi_number: int,
+        note_name: str,
+        start_time: float,
+        duration: float,
+        frequency: float,
+        confidence: float,
+        velocity: int | None = None,
+        energy: float | None = None,
+    ) -> "Note":
+        """
+        Construye una nota sin validar rangos (solo para productores internos).
+
+        Para los pasos que derivan notas de otras ya validadas (merge, refine,
+        NoteArray.to_notes): evita __post_init__ por cada nota. La velocity se
+        calcula igual que en el constructor normal.
+        """
+        note = object.__new__(cls)
+        set_field = object.__setattr__
+        set_field(note, "midi_number", midi_number)
+        set_field(note, "note_name", note_name)
+        set_field(note, "start_time", start_time)
+        set_field(note, "duration", duration)
+        set_field(note, "frequency", frequency)
+        set_field(note, "confidence", confidence)
+        set_field(
+            note, "velocity",
+            _default_velocity(confidence, energy) if velocity is None else velocity,
+        )
+        set_field(note, "energy", energy)
+        return note
 
     @property
     def end_time(self) -> float:
@@ -130,3 +228,125 @@ class Note:
             "confidence": self.confidence,
             "velocity": self.velocity,
         }
+
+
+@dataclass
+class NoteArray:
+    """
+    Notas en formato columnar (Structure-of-Arrays): un array numpy por campo.
+
+    Vista alternativa a list[Note] para los pasos que recorren todas las notas
+    (generación MIDI, serialización, filtros con máscaras) sin crear un objeto
+    Python por nota. Indexar con una máscara, slice o array de índices
+    devuelve otro NoteArray.
+
+    Attributes:
+        midi_number: Números MIDI (int16)
+        start_time: Tiempos de inicio en segundos (float64)
+        duration: Duraciones en segundos (float64)
+        frequency: Frecuencias promedio en Hz (float64)
+        confidence: Confianzas promedio (float64)
+        velocity: Velocidades MIDI (int16)
+        energy: Energía RMS promedio (float64, NaN si la nota no tiene)
+    """
+
+    midi_number: np.ndarray
+    start_time: np.ndarray
+    duration: np.ndarray
+    frequency: np.ndarray
+    confidence: np.ndarray
+    velocity: np.ndarray
+    energy: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.midi_number)
+
+    def __getitem__(self, index) -> "NoteArray":
+        return NoteArray(
+            midi_number=self.midi_number[index],
+            start_time=self.start_time[index],
+            duration=self.duration[index],
+            frequency=self.frequency[index],
+            confidence=self.confidence[index],
+            velocity=self.velocity[index],
+            energy=self.energy[index],
+        )
+
+    @property
+    def end_time(self) -> np.ndarray:
+        """Calcula los tiempos de fin de las notas."""
+        return self.start_time + self.duration
+
+    @classmethod
+    def from_notes(cls, notes: list[Note]) -> "NoteArray":
+        """Construye la vista columnar a partir de una lista de notas."""
+        n_notes = len(notes)
+        return cls(
+            midi_number=np.fromiter((n.midi_number for n in notes), dtype=np.int16, count=n_notes),
+            start_time=np.fromiter((n.start_time for n in notes), dtype=np.float64, count=n_notes),
+            duration=np.fromiter((n.duration for n in notes), dtype=np.float64, count=n_notes),
+            frequency=np.fromiter((n.frequency for n in notes), dtype=np.float64, count=n_notes),
+            confidence=np.fromiter((n.confidence for n in notes), dtype=np.float64, count=n_notes),
+            velocity=np.fromiter((n.velocity for n in notes), dtype=np.int16, count=n_notes),
+            energy=np.fromiter(
+                (np.nan if n.energy is None else n.energy for n in notes),
+                dtype=np.float64, count=n_notes,
+            ),
+        )
+
+    def to_notes(self) -> list[Note]:
+        """Materializa las notas como objetos Note (nombre de nota incluido)."""
+        # Las columnas salen de notas ya validadas: sin re-validar cada una
+        return [
+            Note.unchecked(
+                midi_number=midi_number,
+                note_name=note_name,
+                start_time=start_time,
+                duration=duration,
+                frequency=frequency,
+                confidence=confidence,
+                velocity=velocity,
+                energy=None if np.isnan(energy) else energy,
+            )
+            for (
+                midi_number, note_name, start_time, duration, frequency, confidence, velocity, energy,
+            ) in zip(
+                self.midi_number.tolist(),
+                MIDI_NOTE_NAMES_ARRAY[self.midi_number].tolist(),
+                self.start_time.tolist(),
+                self.duration.tolist(),
+                self.frequency.tolist(),
+                self.confidence.tolist(),
+                self.velocity.tolist(),
+                self.energy.tolist(),
+                strict=True,
+            )
+        ]
+
+    def to_dicts(self) -> list[dict]:
+        """Serializa las notas con el mismo formato que Note.to_dict."""
+        return [
+            {
+                "midi_number": midi_number,
+                "note_name": note_name,
+                "start_time": start_time,
+                "duration": duration,
+                "end_time": end_time,
+                "frequency": frequency,
+                "confidence": confidence,
+                "velocity": velocity,
+            }
+            for (
+                midi_number, note_name, start_time, duration, end_time, frequency, confidence, velocity,
+            ) in zip(
+                self.midi_number.tolist(),
+                MIDI_NOTE_NAMES_ARRAY[self.midi_number].tolist(),
+                self.start_time.tolist(),
+                self.duration.tolist(),
+                self.end_time.tolist(),
+                self.frequency.tolist(),
+                self.confidence.tolist(),
+                self.velocity.tolist(),
+                strict=True,
+            )
+        ]
@@ -1,13 +1,24 @@
 """Segmentación de pitch frames en notas musicales discretas."""
 
+from itertools import repeat
+
+import librosa
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import median_filter
+
+from src.audio.kernels import segment_runs
+from src.audio.models import Note, PitchFrame, PitchTrack
+from src.utils.converters import MIDI_NOTE_NAMES
 
-from src.audio.models import Note, PitchFrame
-from src.utils.converters import hz_to_midi, midi_to_note_name
+# Umbral adaptivo de onsets por energía: θ = C · mediana de la derivada en
+# una ventana de P frames (500ms)
+_ONSET_THRESHOLD_SCALE = 0.5
+_ONSET_THRESHOLD_WINDOW = 50
 
 
 def segment_notes(
-    frames: list[PitchFrame],
+    frames: list[PitchFrame] | PitchTrack,
     energy: np.ndarray | None = None,
     energy_threshold: float = 0.01,
     confidence_threshold: float = 0.5,
@@ -22,7 +33,7 @@ def segment_notes(
     Filtra por energía (si se provee), confianza del modelo y frecuencia mínima.
 
     Args:
-        frames: Lista de PitchFrame del pitch detector
+        frames: Frames del pitch detector (PitchTrack o lista de PitchFrame)
         energy: Array de energía RMS por frame (opcional)
         energy_threshold: Umbral mínimo de energía
         confidence_threshold: Umbral mínimo de confianza del modelo (0-1)
@@ -34,112 +45,94 @@ def segment_notes(
     Returns:
         Lista de notas musicales detectadas, ordenadas por tiempo
     """
-    if not frames:
+    if len(frames) == 0:
         return []
 
-    notes: list[Note] = []
-    current_midi: int | None = None
-    note_start: float = 0.0
-    note_freqs: list[float] = []
-    note_confs: list[float] = []
-    note_energies: list[float] = []
-
-    for i, frame in enumerate(frames):
-        # Determinar si el frame es válido
-        has_energy = True
-        frame_energy = 0.0
-        if energy is not None and i < len(energy):
-            has_energy = energy[i] > energy_threshold
-            frame_energy = float(energy[i])
-
-        is_valid = frame.frequency > min_freq and frame.confidence >= confidence_threshold and has_energy
-
-        if is_valid:
-            midi_num = hz_to_midi(frame.frequency)
-
-            if current_midi is None:
-                # Iniciar nueva nota
-                current_midi = midi_num
-                note_start = frame.time
-                note_freqs = [frame.frequency]
-                note_confs = [frame.confidence]
-                note_energies = [frame_energy]
-
-            elif midi_num == current_midi:
-                # Continuar nota actual
-                note_freqs.append(frame.frequency)
-                note_confs.append(frame.confidence)
-                note_energies.append(frame_energy)
-
-            else:
-                # Cambio de nota: guardar anterior
-                _maybe_add_note(
-                    notes, current_midi, note_start, frame.time,
-                    note_freqs, note_confs, note_energies,
-                    min_note_duration, time_offset,
-                )
-                # Iniciar nueva
-                current_midi = midi_num
-                note_start = frame.time
-                note_freqs = [frame.frequency]
-                note_confs = [frame.confidence]
-                note_energies = [frame_energy]
-        else:
-            # Silencio o ruido: cerrar nota actual
-            if current_midi is not None:
-                _maybe_add_note(
-                    notes, current_midi, note_start, frame.time,
-                    note_freqs, note_confs, note_energies,
-                    min_note_duration, time_offset,
-                )
-                current_midi = None
-                note_freqs = []
-                note_confs = []
-                note_energies = []
-
-    # Cerrar última nota si existe
-    if current_midi is not None and note_freqs:
-        end_time = frames[-1].time + 0.01  # Agregar un frame más
-        _maybe_add_note(
-            notes, current_midi, note_start, end_time,
-            note_freqs, note_confs, note_energies,
-            min_note_duration, time_offset,
-        )
-
-    return notes
+    if isinstance(frames, PitchTrack):
+        freqs = np.ascontiguousarray(frames.frequency, dtype=np.float64)
+        confs = np.ascontiguousarray(frames.confidence, dtype=np.float64)
+    else:
+        # Solo frecuencia y confianza se necesitan por frame; los tiempos se
+        # leen después únicamente en los límites de cada segmento
+        n_frames = len(frames)
+        freqs = np.fromiter((f.frequency for f in frames), dtype=np.float64, count=n_frames)
+        confs = np.fromiter((f.confidence for f in frames), dtype=np.float64, count=n_frames)
+
+    # Segmentos de frames válidos con el mismo MIDI (kernel compilado, una pasada)
+    energy_arr = np.empty(0) if energy is None else np.ascontiguousarray(energy, dtype=np.float64)
+    midi, starts, ends, freq_sums, conf_sums, energy_sums = segment_runs(
+        freqs, confs, energy_arr, min_freq, confidence_threshold, energy_threshold,
+    )
 
+    if len(starts) == 0:
+        return []
 
-def _maybe_add_note(
-    notes: list[Note],
-    midi_number: int,
-    start_time: float,
-    end_time: float,
-    frequencies: list[float],
-    confidences: list[float],
-    energies: list[float],
-    min_duration: float,
-    time_offset: float = 0.0,
-) -> None:
-    """Agrega una nota a la lista si cumple con la duración mínima."""
-    duration = end_time - start_time
-    if duration < min_duration or not frequencies:
-        return
+    start_times, end_times = _run_times(frames, starts, ends)
+    durations = end_times - start_times
 
-    avg_freq = sum(frequencies) / len(frequencies)
-    avg_conf = sum(confidences) / len(confidences)
-    avg_energy = sum(energies) / len(energies) if energies else None
+    # Índices de los segmentos que sobreviven: cada array se filtra una sola vez
+    kept = np.flatnonzero(durations >= min_note_duration)
+    if len(kept) == 0:
+        return []
 
-    notes.append(
+    # Promedios y offset de tiempo en una operación por columna; por nota solo
+    # quedan el redondeo y la construcción de la Note (sin helper intermedio)
+    counts = ends[kept] - starts[kept]
+    # Sin energía las sumas son todas 0.0: no se divide ni se convierte la columna
+    energy_means = (
+        repeat(0.0, len(kept)) if energy is None else (energy_sums[kept] / counts).tolist()
+    )
+    return [
         Note(
             midi_number=midi_number,
-            note_name=midi_to_note_name(midi_number),
-            start_time=round(start_time + time_offset, 4),
+            note_name=MIDI_NOTE_NAMES[midi_number],
+            start_time=round(start_time, 4),
             duration=round(duration, 4),
             frequency=round(avg_freq, 2),
             confidence=round(avg_conf, 3),
-            energy=avg_energy if avg_energy and avg_energy > 0 else None,
+            energy=avg_energy if avg_energy > 0 else None,
+        )
+        for midi_number, start_time, duration, avg_freq, avg_conf, avg_energy in zip(
+            midi[kept].tolist(),
+            (start_times[kept] + time_offset).tolist(),
+            durations[kept].tolist(),
+            (freq_sums[kept] / counts).tolist(),
+            (conf_sums[kept] / counts).tolist(),
+            energy_means,
+            strict=True,
+        )
+    ]
+
+
+def _run_times(
+    frames: list[PitchFrame] | PitchTrack,
+    starts: np.ndarray,
+    ends: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Tiempos de inicio y fin de cada segmento [start, end) de frames.
+
+    La nota termina en el frame que la interrumpe; la última agrega un frame
+    más. Solo se leen los tiempos de los frames límite.
+    """
+    n_frames = len(frames)
+    if isinstance(frames, PitchTrack):
+        times = frames.time
+        end_times = np.where(
+            ends < n_frames, times[np.minimum(ends, n_frames - 1)], times[-1] + 0.01,
         )
+        return times[starts], end_times
+
+    n_runs = len(starts)
+    last_end = frames[-1].time + 0.01
+    start_times = np.fromiter(
+        (frames[i].time for i in starts.tolist()), dtype=np.float64, count=n_runs,
     )
+    end_times = np.fromiter(
+        (frames[i].time if i < n_frames else last_end for i in ends.tolist()),
+        dtype=np.float64, count=n_runs,
+    )
+    return start_times, end_times
 
 
 def merge_same_pitch_notes(
@@ -162,57 +155,96 @@ def merge_same_pitch_notes(
     if len(notes) <= 1:
         return notes
 
-    merged: list[Note] = [notes[0]]
+    merged: list[Note] = []
+
+    # Estado escalar de la nota abierta: una cadena de fusiones se acumula en
+    # locales y la Note fusionada se construye una sola vez al cerrarla. Las
+    # notas que no se fusionan se reutilizan tal cual
+    head = notes[0]
+    midi_number = head.midi_number
+    start_time = head.start_time
+    duration = head.duration
+    frequency = head.frequency
+    confidence = head.confidence
+    energy = head.energy
+    fused = False
 
     for note in notes[1:]:
-        prev = merged[-1]
-        gap = note.start_time - prev.end_time
+        gap = note.start_time - (start_time + duration)
 
-        if note.midi_number == prev.midi_number and 0 <= gap <= max_gap:
+        if note.midi_number == midi_number and 0 <= gap <= max_gap:
             # Fusionar: promediar freq/conf/energy ponderado por duración
-            total_dur = prev.duration + note.duration + gap
-            w_prev = prev.duration / total_dur
+            total_dur = duration + note.duration + gap
+            w_prev = duration / total_dur
             w_note = note.duration / total_dur
 
-            avg_freq = prev.frequency * w_prev + note.frequency * w_note
-            avg_conf = prev.confidence * w_prev + note.confidence * w_note
+            avg_freq = frequency * w_prev + note.frequency * w_note
+            avg_conf = confidence * w_prev + note.confidence * w_note
 
             # Energy: promediar si ambas tienen, usar la que exista, o None
-            avg_energy = None
-            if prev.energy is not None and note.energy is not None:
-                avg_energy = prev.energy * w_prev + note.energy * w_note
-            elif prev.energy is not None:
-                avg_energy = prev.energy
-            elif note.energy is not None:
-                avg_energy = note.energy
-
-            merged[-1] = Note(
-                midi_number=prev.midi_number,
-                note_name=prev.note_name,
-                start_time=prev.start_time,
-                duration=round(total_dur, 4),
-                frequency=round(avg_freq, 2),
-                confidence=round(avg_conf, 3),
-                energy=avg_energy,
-            )
-        else:
-            merged.append(note)
-
+            if energy is not None and note.energy is not None:
+                energy = energy * w_prev + note.energy * w_note
+            elif energy is None:
+                energy = note.energy
+
+            duration = round(total_dur, 4)
+            frequency = round(avg_freq, 2)
+            confidence = round(avg_conf, 3)
+            fused = True
+            continue
+
+        merged.append(_close_merge(head, fused, duration, frequency, confidence, energy))
+        head = note
+        midi_number = note.midi_number
+        start_time = note.start_time
+        duration = note.duration
+        frequency = note.frequency
+        confidence = note.confidence
+        energy = note.energy
+        fused = False
+
+    merged.append(_close_merge(head, fused, duration, frequency, confidence, energy))
     return merged
 
 
+def _close_merge(
+    head: Note,
+    fused: bool,
+    duration: float,
+    frequency: float,
+    confidence: float,
+    energy: float | None,
+) -> Note:
+    """Nota resultante de una cadena de fusiones que empieza en head."""
+    if not fused:
+        return head
+    return Note.unchecked(
+        midi_number=head.midi_number,
+        note_name=head.note_name,
+        start_time=head.start_time,
+        duration=duration,
+        frequency=frequency,
+        confidence=confidence,
+        energy=energy,
+    )
+
+
 def refine_onsets(
     notes: list[Note],
     energy: np.ndarray,
     time_offset: float = 0.0,
     lookback_frames: int = 5,
     hop_seconds: float = 0.01,
+    onset_envelope: np.ndarray | None = None,
 ) -> list[Note]:
     """
-    Ajusta el inicio de cada nota al onset real de energía.
+    Ajusta el inicio de cada nota al onset real del sonido.
 
-    Busca el máximo de la derivada de energía en los frames previos al start_time
-    detectado. Esto captura el ataque real del sonido (transiente de energía).
+    Con onset_envelope (spectral flux de compute_onset_envelope) se eligen
+    los picos de la función de onsets una sola vez para toda la canción y
+    cada nota se lleva al último pico dentro de la ventana de lookback
+    (búsqueda binaria). Sin él, se usa el máximo de la derivada de energía
+    en los frames previos al start_time detectado.
 
     Args:
         notes: Lista de notas ordenadas por tiempo
@@ -220,6 +252,7 @@ def refine_onsets(
         time_offset: Offset de tiempo aplicado a las notas
         lookback_frames: Cuántos frames antes buscar el onset (default 5 = 50ms)
         hop_seconds: Duración de cada frame en segundos (default 10ms)
+        onset_envelope: Fuerza de onset por frame (opcional)
 
     Returns:
         Lista de notas con start_time ajustado
@@ -227,37 +260,30 @@ def refine_onsets(
     if len(energy) == 0 or not notes:
         return notes
 
-    # Derivada de energía (diferencias finitas)
-    energy_diff = np.diff(energy, prepend=energy[0])
+    if onset_envelope is not None and len(onset_envelope) > 0:
+        onset_frames = _flux_onset_frames(
+            notes, onset_envelope, time_offset, lookback_frames, hop_seconds,
+        )
+    else:
+        onset_frames = _energy_onset_frames(
+            notes, energy, time_offset, lookback_frames, hop_seconds,
+        )
 
     refined: list[Note] = []
 
-    for idx, note in enumerate(notes):
-        # Convertir start_time a índice de frame
-        note_time_raw = note.start_time - time_offset
-        frame_idx = int(round(note_time_raw / hop_seconds))
-        frame_idx = max(0, min(frame_idx, len(energy) - 1))
-
-        # Buscar máximo de derivada en ventana de lookback
-        search_start = max(0, frame_idx - lookback_frames)
-        search_end = frame_idx + 1  # incluir frame actual
-
-        if search_start < search_end and search_end <= len(energy_diff):
-            window = energy_diff[search_start:search_end]
-            onset_offset = np.argmax(window)
-            onset_frame = search_start + onset_offset
+    for note, onset_frame in zip(notes, onset_frames.tolist(), strict=True):
+        if onset_frame >= 0:
             new_start = round(onset_frame * hop_seconds + time_offset, 4)
 
             # No solapar con nota anterior
-            if idx > 0 and refined:
-                prev_end = refined[-1].end_time
-                new_start = max(new_start, prev_end)
+            if refined:
+                new_start = max(new_start, refined[-1].end_time)
 
             # Solo ajustar si el nuevo start es antes o igual al original
             if new_start <= note.start_time:
                 new_duration = round(note.end_time - new_start, 4)
                 if new_duration > 0:
-                    refined.append(Note(
+                    refined.append(Note.unchecked(
                         midi_number=note.midi_number,
                         note_name=note.note_name,
                         start_time=new_start,
@@ -274,6 +300,79 @@ def refine_onsets(
     return refined
 
 
+def _note_frames(
+    notes: list[Note], n_frames: int, time_offset: float, hop_seconds: float,
+) -> np.ndarray:
+    """Índice de frame del start_time de cada nota (acotado al array)."""
+    starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=len(notes))
+    frame_idx = np.rint((starts - time_offset) / hop_seconds).astype(np.int64)
+    return np.clip(frame_idx, 0, n_frames - 1)
+
+
+def _energy_onset_frames(
+    notes: list[Note],
+    energy: np.ndarray,
+    time_offset: float,
+    lookback_frames: int,
+    hop_seconds: float,
+) -> np.ndarray:
+    """
+    Frame de onset de cada nota: máximo de la derivada de energía en el lookback.
+
+    Solo cuentan los frames cuya derivada supera un umbral adaptivo (mediana
+    local escalada); si ninguno lo supera, la nota no se mueve (-1).
+    """
+    # Derivada de energía (diferencias finitas) y umbral θ = C · mediana local
+    energy_diff = np.diff(energy, prepend=energy[0])
+    threshold = _ONSET_THRESHOLD_SCALE * median_filter(
+        energy_diff, size=_ONSET_THRESHOLD_WINDOW, mode="nearest",
+    )
+    score = np.where(energy_diff > threshold, energy_diff, -np.inf)
+
+    # Ventana de lookback de cada nota (incluye el frame actual) como vista
+    # sobre el score rellenado al inicio: un solo argmax para todas las notas
+    padded = np.concatenate((np.full(lookback_frames, -np.inf), score))
+    windows = sliding_window_view(padded, lookback_frames + 1)
+    frame_idx = _note_frames(notes, len(energy), time_offset, hop_seconds)
+    note_windows = windows[frame_idx]
+    best = np.argmax(note_windows, axis=1)
+    has_onset = np.isfinite(note_windows[np.arange(len(best)), best])
+    return np.where(has_onset, frame_idx - lookback_frames + best, -1)
+
+
+def _flux_onset_frames(
+    notes: list[Note],
+    onset_envelope: np.ndarray,
+    time_offset: float,
+    lookback_frames: int,
+    hop_seconds: float,
+) -> np.ndarray:
+    """Frame de onset de cada nota: último pico de spectral flux en el lookback (-1 si no hay)."""
+    # Picos con los mismos parámetros por defecto que librosa.onset.onset_detect
+    # (30ms de máximo previo, 100ms de promedio, 30ms entre onsets)
+    fps = 1.0 / hop_seconds
+    envelope = onset_envelope - onset_envelope.min()
+    peak_max = envelope.max()
+    if peak_max > 0:
+        envelope /= peak_max
+    peaks = librosa.util.peak_pick(
+        envelope,
+        pre_max=int(0.03 * fps), post_max=1,
+        pre_avg=int(0.10 * fps), post_avg=int(0.10 * fps) + 1,
+        delta=0.07, wait=int(0.03 * fps),
+    )
+
+    frame_idx = _note_frames(notes, len(onset_envelope), time_offset, hop_seconds)
+    if len(peaks) == 0:
+        return np.full(len(notes), -1, dtype=np.int64)
+
+    # Último pico en o antes del frame de cada nota
+    last = np.searchsorted(peaks, frame_idx, side="right") - 1
+    candidates = peaks[np.maximum(last, 0)]
+    in_window = (last >= 0) & (candidates >= frame_idx - lookback_frames)
+    return np.where(in_window, candidates, -1)
+
+
 def filter_short_notes(
     notes: list[Note],
     min_duration: float = 0.06,
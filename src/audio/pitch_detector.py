@@ -1,16 +1,15 @@
 """Detección de pitch usando TorchCREPE."""
 
-from typing import Literal
+import functools
 
 import numpy as np
 import torch
 import torchcrepe
 import torchcrepe.decode
 
-from src.audio.models import PitchFrame
-
-
-ModelSize = Literal["tiny", "full"]
+from src.audio.models import PitchTrack
+from src.audio.preprocessor import compute_energy_threshold, compute_frame_energy
+from src.core.config import ModelSize, settings
 
 
 def detect_pitches(
@@ -18,10 +17,11 @@ def detect_pitches(
     sr: int,
     model_size: ModelSize = "tiny",
     device: str | None = None,
-    batch_size: int = 512,
+    batch_size: int | None = None,
     fmin: float = 65.0,
     fmax: float = 1047.0,
-) -> list[PitchFrame]:
+    energy: np.ndarray | None = None,
+) -> PitchTrack:
     """
     Detecta pitch frame a frame usando TorchCREPE.
 
@@ -30,52 +30,380 @@ def detect_pitches(
         sr: Sample rate del audio
         model_size: Tamaño del modelo ('tiny' o 'full')
         device: Device de PyTorch (None = auto-detect)
-        batch_size: Batch size para inferencia (512 óptimo para GPU)
+        batch_size: Frames por batch de inferencia (None = según device:
+            settings.CREPE_BATCH_SIZE_CUDA en GPU, settings.CREPE_BATCH_SIZE en CPU).
+            Si la GPU se queda sin memoria se reintenta con la mitad.
         fmin: Frecuencia mínima en Hz (65 = C2)
         fmax: Frecuencia máxima en Hz (1047 = C6)
+        energy: Energía RMS por frame de compute_frame_energy (opcional; se
+            calcula si no se pasa y settings.CREPE_SKIP_SILENCE está activo)
 
     Returns:
-        Lista de PitchFrame con tiempo, frecuencia y confianza
+        PitchTrack con tiempo, frecuencia y confianza por frame
     """
     if device is None:
         device = "cuda" if torch.cuda.is_available() else "cpu"
 
-    # Preparar tensor
-    audio_tensor = torch.from_numpy(audio).unsqueeze(0).to(device)
-
-    # Ejecutar predicción con Viterbi decoding y rango vocal
-    pitch, periodicity = torchcrepe.predict(
-        audio_tensor,
-        sample_rate=sr,
-        model=model_size,
-        batch_size=batch_size,
-        device=device,
-        return_periodicity=True,
-        decoder=torchcrepe.decode.viterbi,
-        fmin=fmin,
-        fmax=fmax,
-    )
+    use_cuda = device.startswith("cuda")
+    if batch_size is None:
+        batch_size = settings.CREPE_BATCH_SIZE_CUDA if use_cuda else settings.CREPE_BATCH_SIZE
 
-    # Extraer resultados como numpy arrays
-    freq_np = pitch[0].cpu().numpy()
-    conf_np = periodicity[0].cpu().numpy()
-    n_frames = len(freq_np)
+    use_graphs = use_cuda and settings.CREPE_CUDA_GRAPHS
+    use_compile = use_cuda and settings.CREPE_TORCH_COMPILE
+    _prepare_model(model_size, device, use_graphs, use_compile)
 
-    # Clamp frecuencias negativas
-    freq_np = np.maximum(freq_np, 0.0)
+    # Saltar silencios: CREPE solo procesa los frames con energía (más un margen)
+    # y los demás quedan con frecuencia y confianza 0. Solo compensa si se
+    # descarta al menos un 10% del audio.
+    voiced = None
+    if settings.CREPE_SKIP_SILENCE and sr == torchcrepe.SAMPLE_RATE:
+        if energy is None:
+            energy = compute_frame_energy(audio, sr)
+        voiced = _voiced_frame_mask(energy, settings.CREPE_SILENCE_MARGIN_FRAMES)
+        if voiced.mean() > 0.9:
+            voiced = None
+
+    if voiced is None:
+        freq_np, conf_np = _run_crepe(
+            audio, sr, model_size, batch_size, device, fmin, fmax, use_cuda, use_graphs,
+        )
+        n_frames = len(freq_np)
+    else:
+        n_frames = len(voiced)
+        voiced_idx = np.flatnonzero(voiced)
+        freq_np = np.zeros(n_frames, dtype=np.float32)
+        conf_np = np.zeros(n_frames, dtype=np.float32)
+        if len(voiced_idx) > 0:
+            # Los tramos se infieren juntos pero se decodifican por separado:
+            # Viterbi limita el salto de pitch por frame, y un solo path sobre
+            # tramos concatenados arrastraría el pitch entre frases distantes
+            run_starts, run_ends = _mask_runs(voiced)
+            voiced_freq, voiced_conf = _run_crepe(
+                _gather_frames(audio, run_starts, run_ends, hop_samples=sr // 100),
+                sr, model_size, batch_size, device, fmin, fmax, use_cuda, use_graphs,
+                run_lengths=(run_ends - run_starts).tolist(),
+            )
+            freq_np[voiced_idx] = voiced_freq
+            conf_np[voiced_idx] = voiced_conf
 
     # Timestamps (10ms por frame, default torchcrepe)
     hop_ms = 10.0
     timestamps = np.arange(n_frames) * (hop_ms / 1000.0)
 
-    # Construir PitchFrames vectorizado
-    frames = [
-        PitchFrame(
-            time=timestamps[i],
-            frequency=float(freq_np[i]),
-            confidence=float(conf_np[i]),
+    # Columnas directamente, sin crear un PitchFrame por frame
+    return PitchTrack(
+        time=timestamps,
+        frequency=freq_np.astype(np.float64),
+        confidence=conf_np.astype(np.float64),
+    )
+
+
+def preload_models(model_sizes: list[ModelSize], device: str | None = None) -> None:
+    """
+    Carga los pesos de CREPE en el cache del proceso sin ejecutar inferencia.
+
+    Más barato que warmup_models: evita la lectura de pesos del primer job,
+    pero no la compilación ni la captura de CUDA Graphs.
+
+    Args:
+        model_sizes: Modelos a cargar ('tiny' y/o 'full')
+        device: Device de PyTorch (None = auto-detect)
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    use_cuda = device.startswith("cuda")
+    for model_size in model_sizes:
+        _load_model(
+            model_size, device,
+            use_cuda and settings.CREPE_CUDA_GRAPHS,
+            use_cuda and settings.CREPE_TORCH_COMPILE,
+        )
+
+
+def warmup_models(model_sizes: list[ModelSize], device: str | None = None) -> None:
+    """
+    Precarga y ejecuta una vez cada modelo para que los jobs posteriores no
+    paguen la lectura de pesos, la compilación ni la captura de CUDA Graphs.
+
+    La inferencia de warm-up usa un batch completo, el tamaño que van a usar
+    los jobs.
+
+    Args:
+        model_sizes: Modelos a preparar ('tiny' y/o 'full')
+        device: Device de PyTorch (None = auto-detect)
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    batch_size = (
+        settings.CREPE_BATCH_SIZE_CUDA if device.startswith("cuda") else settings.CREPE_BATCH_SIZE
+    )
+    sr = torchcrepe.SAMPLE_RATE
+    t = np.arange(batch_size * (sr // 100)) / sr
+    audio = (0.5 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+
+    for model_size in model_sizes:
+        detect_pitches(audio, sr, model_size=model_size, device=device, batch_size=batch_size)
+
+
+def _run_crepe(
+    audio: np.ndarray,
+    sr: int,
+    model_size: ModelSize,
+    batch_size: int,
+    device: str,
+    fmin: float,
+    fmax: float,
+    use_cuda: bool,
+    use_graphs: bool,
+    run_lengths: list[int] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Transfiere el audio al device y devuelve (frecuencia, confianza) por frame.
+
+    Con run_lengths el audio son tramos concatenados y se devuelven solo sus
+    sum(run_lengths) frames, cada tramo decodificado por separado.
+    """
+    # Preparar tensor (from_numpy no copia). En GPU se transfiere en FP16 desde
+    # memoria pinned (mitad de tráfico PCIe) y se vuelve a FP32 ya en el device:
+    # la normalización de torchcrepe divide por max(std, 1e-10), que en FP16 es 0
+    audio_tensor = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)).unsqueeze(0)
+    if use_cuda:
+        audio_tensor = audio_tensor.half().pin_memory().to(device, non_blocking=True).float()
+    else:
+        audio_tensor = audio_tensor.to(device)
+
+    while True:
+        try:
+            pitch, periodicity = _predict(
+                audio_tensor, sr, model_size, batch_size, device, fmin, fmax, use_graphs,
+                run_lengths,
+            )
+            break
+        except torch.cuda.OutOfMemoryError:
+            if batch_size <= 1:
+                raise
+            torch.cuda.empty_cache()
+            batch_size //= 2
+
+    # Extraer resultados como numpy arrays (float32 aunque la inferencia sea FP16):
+    # el clamp de frecuencias negativas se hace en el device y pitch y
+    # periodicity se apilan ahí para una sola copia al host
+    results = torch.stack((pitch[0].clamp_min(0.0), periodicity[0])).float()
+    if use_cuda:
+        # DMA directo a memoria pinned (sin el buffer de staging pageable de
+        # .cpu()); se sincroniza solo el stream actual antes de leerla
+        host = torch.empty(results.shape, dtype=torch.float32, pin_memory=True)
+        host.copy_(results, non_blocking=True)
+        torch.cuda.current_stream().synchronize()
+        results = host
+    freq_np, conf_np = results.cpu().numpy()
+    return freq_np, conf_np
+
+
+def _voiced_frame_mask(energy: np.ndarray, margin_frames: int) -> np.ndarray:
+    """
+    Marca los frames (hop de 10ms) con energía sobre el umbral adaptivo.
+
+    Usa el mismo umbral que la segmentación de notas, así que los frames
+    descartados no habrían producido notas. La máscara se dilata margin_frames
+    por lado para que la ventana de CREPE (64ms) de los frames con voz vea su
+    contexto real y no el tramo contiguo.
+    """
+    mask = energy > compute_energy_threshold(energy)
+    if margin_frames > 0:
+        kernel = np.ones(2 * margin_frames + 1, dtype=np.int64)
+        mask = np.convolve(mask.astype(np.int64), kernel, mode="same") > 0
+    return mask
+
+
+def _mask_runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Tramos contiguos True de la máscara: (inicios, fines exclusivos)."""
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _gather_frames(
+    audio: np.ndarray, run_starts: np.ndarray, run_ends: np.ndarray, hop_samples: int,
+) -> np.ndarray:
+    """Concatena las muestras de los tramos de frames [inicio, fin), alineadas al hop."""
+    return np.concatenate([
+        audio[start * hop_samples:end * hop_samples]
+        for start, end in zip(run_starts.tolist(), run_ends.tolist(), strict=True)
+    ])
+
+
+def _predict(
+    audio_tensor: torch.Tensor,
+    sr: int,
+    model_size: ModelSize,
+    batch_size: int,
+    device: str,
+    fmin: float,
+    fmax: float,
+    use_graphs: bool = False,
+    run_lengths: list[int] | None = None,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Ejecuta TorchCREPE con Viterbi decoding y rango vocal.
+
+    Con run_lengths, los frames se infieren en batches como siempre, pero
+    Viterbi y la periodicity se calculan tramo por tramo.
+    """
+    # FP16 solo en GPU (en CPU autocast a float16 es más lento)
+    use_amp = device.startswith("cuda")
+
+    # El cache de pesos casteados de autocast no es compatible con CUDA Graphs
+    with torch.inference_mode(), torch.autocast(
+        device_type="cuda" if use_amp else "cpu",
+        dtype=torch.float16,
+        enabled=use_amp,
+        cache_enabled=not use_graphs,
+    ):
+        if run_lengths is None:
+            return torchcrepe.predict(
+                audio_tensor,
+                sample_rate=sr,
+                model=model_size,
+                batch_size=batch_size,
+                device=device,
+                return_periodicity=True,
+                decoder=torchcrepe.decode.viterbi,
+                fmin=fmin,
+                fmax=fmax,
+            )
+
+        return _predict_runs(
+            audio_tensor, sr, model_size, batch_size, device, fmin, fmax, run_lengths,
+        )
+
+
+def _predict_runs(
+    audio_tensor: torch.Tensor,
+    sr: int,
+    model_size: ModelSize,
+    batch_size: int,
+    device: str,
+    fmin: float,
+    fmax: float,
+    run_lengths: list[int],
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Infiere los tramos concatenados en batches y decodifica cada tramo aparte.
+
+    Cada tramo se decodifica apenas sus frames están inferidos y sus
+    probabilidades se liberan: la memoria queda acotada por el tramo más
+    largo, no por todo el audio.
+    """
+    pitches = []
+    periodicities = []
+    pending: torch.Tensor | None = None  # shape=(frames, 360) aún sin decodificar
+    run = 0
+    for frames in torchcrepe.preprocess(audio_tensor, sr, None, batch_size, device):
+        probabilities = torchcrepe.infer(frames, model_size, device)
+        pending = probabilities if pending is None else torch.cat((pending, probabilities))
+
+        while run < len(run_lengths) and run_lengths[run] <= len(pending):
+            length = run_lengths[run]
+            # shape=(1, 360, frames del tramo), como en torchcrepe.predict
+            pitch, periodicity = torchcrepe.postprocess(
+                pending[:length].T.unsqueeze(0),
+                fmin,
+                fmax,
+                torchcrepe.decode.viterbi,
+                return_periodicity=True,
+            )
+            pitches.append(pitch)
+            periodicities.append(periodicity)
+            pending = pending[length:]
+            run += 1
+
+    return torch.cat(pitches, 1), torch.cat(periodicities, 1)
+
+
+def _prepare_model(
+    model_size: ModelSize, device: str, use_graphs: bool, use_compile: bool = False,
+) -> None:
+    """
+    Instala en torchcrepe.infer el modelo CREPE preparado para esta configuración.
+
+    torchcrepe.predict usa el modelo guardado en torchcrepe.infer.model y lo
+    recarga cuando cambia la capacidad; fijando modelo y capacidad desde el cache
+    se evita releer los pesos al alternar entre 'tiny' y 'full' o entre devices.
+    """
+    infer = torchcrepe.infer
+    infer.model = _load_model(model_size, device, use_graphs, use_compile)
+    infer.capacity = model_size
+
+
+@functools.lru_cache(maxsize=4)
+def _load_model(
+    model_size: ModelSize, device: str, use_graphs: bool, use_compile: bool,
+) -> torch.nn.Module:
+    """Carga los pesos de CREPE y aplica torch.compile / CUDA Graphs (cacheado)."""
+    torchcrepe.load.model(device, model_size)
+    model = torchcrepe.infer.model
+
+    if use_compile:
+        # Con _GraphedCrepe los grafos ya se capturan aquí (shapes fijos por
+        # bucket); sin él, "reduce-overhead" usa los CUDA Graphs de Inductor
+        mode = "default" if use_graphs else "reduce-overhead"
+        model = torch.compile(model, mode=mode, fullgraph=False, dynamic=False)
+
+    if use_graphs:
+        model = _GraphedCrepe(model)
+
+    return model
+
+
+class _GraphedCrepe(torch.nn.Module):
+    """
+    Reproduce el forward de CREPE como CUDA Graph sobre buffers estáticos.
+
+    Se captura un grafo por tamaño de batch redondeado a potencia de 2, de modo
+    que audios de distinta duración (y el último batch, más corto) reutilicen
+    el mismo pool de grafos en lugar de relanzar cada kernel desde Python.
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+        self._graphs: dict[int, tuple[torch.cuda.CUDAGraph, torch.Tensor, torch.Tensor]] = {}
+
+    def forward(self, frames: torch.Tensor, embed: bool = False) -> torch.Tensor:
+        if embed or not frames.is_cuda:
+            return self.model(frames, embed=embed)
+
+        n_frames = frames.shape[0]
+        bucket = 1 << max(n_frames - 1, 0).bit_length()
+        if bucket not in self._graphs:
+            self._graphs[bucket] = self._capture(bucket, frames)
+
+        graph, static_input, static_output = self._graphs[bucket]
+        # Las filas de relleno no afectan al resto: el modelo está en eval()
+        static_input[:n_frames].copy_(frames)
+        graph.replay()
+        return static_output[:n_frames].clone()
+
+    def _capture(
+        self, bucket: int, frames: torch.Tensor,
+    ) -> tuple[torch.cuda.CUDAGraph, torch.Tensor, torch.Tensor]:
+        """Captura el forward para un tamaño de batch fijo."""
+        static_input = torch.zeros(
+            (bucket, frames.shape[1]), dtype=frames.dtype, device=frames.device,
         )
-        for i in range(n_frames)
-    ]
 
-    return frames
+        # Warmup en un stream lateral antes de capturar (requerido por cuDNN)
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                self.model(static_input)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_output = self.model(static_input)
+
+        return graph, static_input, static_output
@@ -1,7 +1,9 @@
 """Preprocesamiento de audio antes de la detección de pitch."""
 
-import numpy as np
 import librosa
+import numpy as np
+
+from src.audio.kernels import frame_rms
 
 
 def preprocess_audio(
@@ -34,7 +36,8 @@ def preprocess_audio(
 
     # 1. Normalizar amplitud (pico a 1.0)
     if normalize:
-        peak = np.max(np.abs(audio))
+        # Pico sin el temporal np.abs(audio) del tamaño de la señal
+        peak = max(float(audio.max()), -float(audio.min()))
         if peak > 0:
             audio = audio / peak
 
@@ -61,16 +64,28 @@ def compute_frame_energy(audio: np.ndarray, sr: int, hop_ms: float = 10.0) -> np
         Array con energía RMS por frame
     """
     hop_samples = int(sr * hop_ms / 1000.0)
-    n_frames = len(audio) // hop_samples + 1
+    # Kernel compilado: una pasada, sin el temporal audio ** 2 (el último
+    # frame es parcial, o 0.0 si el audio es múltiplo del hop)
+    return frame_rms(np.ascontiguousarray(audio), hop_samples)
+
+
+def compute_onset_envelope(audio: np.ndarray, sr: int, hop_ms: float = 10.0) -> np.ndarray:
+    """
+    Calcula la función de detección de onsets (spectral flux) por frame.
+
+    Un solo barrido STFT sobre el audio, con el mismo hop que
+    compute_frame_energy para que los índices de frame coincidan.
 
-    energy = np.zeros(n_frames)
-    for i in range(n_frames):
-        start = i * hop_samples
-        end = min(start + hop_samples, len(audio))
-        if end > start:
-            energy[i] = np.sqrt(np.mean(audio[start:end] ** 2))
+    Args:
+        audio: Array numpy de audio
+        sr: Sample rate
+        hop_ms: Tamaño del hop en milisegundos
 
-    return energy
+    Returns:
+        Array con la fuerza de onset por frame
+    """
+    hop_samples = int(sr * hop_ms / 1000.0)
+    return librosa.onset.onset_strength(y=audio, sr=sr, hop_length=hop_samples)
 
 
 def compute_energy_threshold(energy: np.ndarray, percentile: float = 15.0) -> float:
@@ -87,9 +102,9 @@ def compute_energy_threshold(energy: np.ndarray, percentile: float = 15.0) -> fl
     Returns:
         Umbral de energía
     """
-    threshold = np.percentile(energy, percentile)
+    # Percentil y mediana (percentil 50) con una sola selección sobre el array
+    threshold, median_energy = np.percentile(energy, [percentile, 50.0])
     # Minimo: no filtrar nada si todo es silencio
     # Maximo: nunca usar mas del 10% de la energia mediana como umbral
-    median_energy = np.median(energy)
     cap = median_energy * 0.1
     return max(min(threshold, cap), 0.005)
@@ -1,11 +1,16 @@
 """Configuración centralizada del sistema."""
 
 from pathlib import Path
-from pydantic_settings import BaseSettings
+from typing import Annotated, Literal
 
+from pydantic import field_validator
+from pydantic_settings import BaseSettings, NoDecode
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# Modelos de TorchCREPE disponibles
+ModelSize = Literal["tiny", "full"]
+
 
 class Settings(BaseSettings):
     # General
@@ -15,23 +20,35 @@ class Settings(BaseSettings):
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    API_WORKERS: int = 1   # procesos de Uvicorn (cada uno con su propio pool de jobs)
     CORS_ORIGINS: str = "*"
 
     # Database (SQLite por defecto, 0 costo)
     DATABASE_URL: str = f"sqlite+aiosqlite:///{BASE_DIR / 'data' / 'music2notes.db'}"
+    DB_POOL_SIZE: int = 5       # conexiones persistentes (cada job en curso retiene una)
+    DB_MAX_OVERFLOW: int = 10   # conexiones extra en picos, se cierran al devolverse
 
     # Storage
     STORAGE_PATH: str = str(BASE_DIR / "storage")
 
     # Audio processing
-    DEFAULT_MODEL_SIZE: str = "tiny"
+    DEFAULT_MODEL_SIZE: ModelSize = "tiny"
     DEFAULT_CONFIDENCE_THRESHOLD: float = 0.5
     DEFAULT_MIN_NOTE_DURATION: float = 0.05
     MAX_AUDIO_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
     MAX_AUDIO_DURATION: float = 600  # 10 minutos
+    MAX_CONCURRENT_JOBS: int = 2       # procesos del pool de jobs (uno por job en paralelo)
 
     # TorchCREPE
-    CREPE_BATCH_SIZE: int = 512
+    CREPE_BATCH_SIZE: int = 512        # frames por batch en CPU
+    CREPE_BATCH_SIZE_CUDA: int = 2048  # frames por batch en GPU
+    CREPE_CUDA_GRAPHS: bool = True     # reproducir el forward como CUDA Graph (solo GPU)
+    CREPE_TORCH_COMPILE: bool = False  # fusionar kernels con torch.compile (solo GPU)
+    CREPE_SKIP_SILENCE: bool = True    # no pasar por CREPE los tramos sin energía
+    CREPE_SILENCE_MARGIN_FRAMES: int = 5  # margen en frames alrededor de cada tramo con voz
+    # Modelos a precargar en cada proceso de jobs (ej: "tiny,full"). Se valida
+    # al arrancar: un nombre inválido fallaría en cada proceso del pool
+    CREPE_WARMUP_MODELS: Annotated[list[ModelSize], NoDecode] = []
     CREPE_FMIN: float = 65.0     # C2
     CREPE_FMAX: float = 1047.0   # C6
 
@@ -44,6 +61,7 @@ class Settings(BaseSettings):
     NOTE_MERGE_MAX_GAP: float = 0.08       # segundos
     POST_MERGE_MIN_DURATION: float = 0.06  # segundos
     ONSET_LOOKBACK_FRAMES: int = 5         # frames (50ms)
+    ONSET_SPECTRAL_FLUX: bool = True       # onsets por spectral flux (librosa) en lugar de la derivada de energía
 
     # Key detection & outlier filtering
     KEY_WINDOW_SECONDS: float = 15.0         # ventana para detección de tonalidad
@@ -67,5 +85,13 @@ class Settings(BaseSettings):
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
+    @field_validator("CREPE_WARMUP_MODELS", mode="before")
+    @classmethod
+    def _split_model_list(cls, value: object) -> object:
+        """Acepta la lista separada por comas de la variable de entorno."""
+        if isinstance(value, str):
+            return [m.strip() for m in value.split(",") if m.strip()]
+        return value
+
 
 settings = Settings()
@@ -26,6 +26,11 @@ class StorageError(Music2NotesError):
     pass
 
 
+class FileTooLargeError(StorageError):
+    """El archivo supera el tamaño máximo permitido."""
+    pass
+
+
 class WebhookDeliveryError(Music2NotesError):
     """Error al enviar webhook."""
     pass
@@ -1,15 +1,51 @@
 """Utilidades de seguridad para webhooks."""
 
+import functools
 import hashlib
 import hmac
 import json
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional aquí
+    orjson = None  # type: ignore[assignment]
+
+
+@functools.lru_cache(maxsize=8)
+def _hmac_template(secret: str) -> hmac.HMAC:
+    """
+    HMAC-SHA256 con la clave ya cargada (pads ipad/opad procesados).
+
+    El secret es casi siempre el mismo (settings.WEBHOOK_SECRET_KEY): cada
+    signature copia esta plantilla en lugar de re-derivar la clave.
+    """
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+
+def serialize_webhook_payload(payload: dict) -> bytes:
+    """
+    Bytes canónicos del payload: se firman y se envían tal cual.
+
+    JSON compacto (sin espacios), keys ordenadas y UTF-8 sin escapar. orjson
+    y el fallback con json producen exactamente los mismos bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    ).encode()
+
+
+def sign_webhook_body(body: bytes, secret: str) -> str:
+    """Genera HMAC-SHA256 signature de un body ya serializado."""
+    mac = _hmac_template(secret).copy()
+    mac.update(body)
+    return f"sha256={mac.hexdigest()}"
+
 
 def generate_webhook_signature(payload: dict, secret: str) -> str:
     """Genera HMAC-SHA256 signature del payload para verificación."""
-    payload_bytes = json.dumps(payload, sort_keys=True).encode()
-    signature = hmac.new(secret.encode(), payload_bytes, hashlib.sha256).hexdigest()
-    return f"sha256={signature}"
+    return sign_webhook_body(serialize_webhook_payload(payload), secret)
 
 
 def verify_webhook_signature(payload: dict, signature: str, secret: str) -> bool:
@@ -1,7 +1,9 @@
 """Configuración base de la base de datos SQLite."""
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import StaticPool
 
 from src.core.config import settings
 
@@ -10,10 +12,51 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+def _create_engine():
+    """
+    Engine async con pool de tamaño explícito.
+
+    Las conexiones SQLite de aiosqlite viven cada una en su propio thread: el
+    pool las reutiliza en lugar de abrir (y aplicar los PRAGMA) por sesión.
+    Una base en memoria existe solo dentro de su conexión, así que se
+    comparte una única conexión (StaticPool).
+    """
+    if ":memory:" in settings.DATABASE_URL:
+        return create_async_engine(settings.DATABASE_URL, echo=False, poolclass=StaticPool)
+    return create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
+
+
+engine = _create_engine()
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """
+        Ajusta cada conexión SQLite nueva para escrituras concurrentes.
+
+        WAL deja leer (polling de estado, /health) mientras un job escribe, y
+        synchronous=NORMAL evita un fsync por commit (seguro en modo WAL).
+        busy_timeout espera al lock de escritura en lugar de fallar al instante.
+        Tablas temporales en memoria y 64MB de page cache por conexión (la
+        conexión vive en el pool, así que el cache se reutiliza entre jobs).
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+
+
 async def init_db():
     """Crea todas las tablas en la base de datos."""
     async with engine.begin() as conn:
@@ -3,10 +3,12 @@
 import enum
 import uuid
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import Column, String, Float, Integer, Text, Enum, DateTime, JSON
-from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
+from sqlalchemy import JSON, DateTime, Float, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
 
+from src.core.config import ModelSize
 from src.db.base import Base
 
 
@@ -17,40 +19,63 @@ class JobStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+def new_job_id() -> str:
+    """
+    Genera el ID de un job nuevo (UUID4 en hex, 32 caracteres sin guiones).
+
+    Claves más cortas en el índice de la PK; la columna conserva String(36)
+    para los jobs existentes con el formato con guiones.
+    """
+    return uuid.uuid4().hex
+
+
 class Job(Base):
     __tablename__ = "jobs"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    status = Column(String(20), default=JobStatus.PENDING.value, index=True)
-    progress = Column(Integer, default=0)
+    # Mapped[...] tipa los atributos de instancia (job.started_at es un
+    # datetime | None, no un Column). nullable explícito: el esquema es el
+    # mismo que con Column (solo id y audio_file_path son NOT NULL)
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_job_id)
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=True, default=JobStatus.PENDING.value, index=True,
+    )
+    progress: Mapped[int] = mapped_column(Integer, nullable=True, default=0)
 
     # Input
-    audio_file_path = Column(String, nullable=False)
-    audio_filename = Column(String)
-    audio_duration = Column(Float)
-    model_size = Column(String, default="tiny")
-    confidence_threshold = Column(Float, default=0.5)
+    audio_file_path: Mapped[str] = mapped_column(String, nullable=False)
+    audio_filename: Mapped[str | None] = mapped_column(String)
+    audio_duration: Mapped[float | None] = mapped_column(Float)
+    model_size: Mapped[ModelSize] = mapped_column(String, nullable=True, default="tiny")
+    confidence_threshold: Mapped[float] = mapped_column(Float, nullable=True, default=0.5)
 
     # Output
-    result_data = Column(JSON)
-    midi_file_path = Column(String)
-    json_file_path = Column(String)
-    notes_detected = Column(Integer)
+    result_data: Mapped[dict[str, Any] | None] = mapped_column(JSON)
+    midi_file_path: Mapped[str | None] = mapped_column(String)
+    json_file_path: Mapped[str | None] = mapped_column(String)
+    notes_detected: Mapped[int | None] = mapped_column(Integer)
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    started_at = Column(DateTime)
-    completed_at = Column(DateTime)
-    processing_time = Column(Float)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=True, default=datetime.utcnow,
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime)
+    processing_time: Mapped[float | None] = mapped_column(Float)
 
     # Error
-    error_message = Column(Text)
+    error_message: Mapped[str | None] = mapped_column(Text)
 
     # Webhook
-    webhook_url = Column(String)
-    webhook_sent = Column(Integer, default=0)  # SQLite no tiene boolean
+    webhook_url: Mapped[str | None] = mapped_column(String)
+    # SQLite no tiene boolean
+    webhook_sent: Mapped[int] = mapped_column(Integer, nullable=True, default=0)
 
     def to_dict(self) -> dict:
+        # Cada acceso a una columna pasa por el descriptor instrumentado de
+        # SQLAlchemy: los timestamps se leen una sola vez
+        created_at = self.created_at
+        started_at = self.started_at
+        completed_at = self.completed_at
         return {
             "job_id": self.id,
             "status": self.status,
@@ -59,9 +84,9 @@ class Job(Base):
             "audio_duration": self.audio_duration,
             "model_size": self.model_size,
             "notes_detected": self.notes_detected,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "started_at": self.started_at.isoformat() if self.started_at else None,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "created_at": created_at.isoformat() if created_at else None,
+            "started_at": started_at.isoformat() if started_at else None,
+            "completed_at": completed_at.isoformat() if completed_at else None,
             "processing_time": self.processing_time,
             "error_message": self.error_message,
         }
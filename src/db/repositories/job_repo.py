@@ -1,8 +1,9 @@
 """Repositorio de operaciones CRUD para Jobs."""
 
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.models.job import Job, JobStatus
@@ -15,9 +16,11 @@ async def create_job(
     model_size: str = "tiny",
     confidence_threshold: float = 0.5,
     webhook_url: str | None = None,
+    job_id: str | None = None,
 ) -> Job:
-    """Crea un nuevo job en la base de datos."""
+    """Crea un nuevo job en la base de datos (job_id=None genera uno nuevo)."""
     job = Job(
+        id=job_id,
         audio_file_path=audio_file_path,
         audio_filename=audio_filename,
         model_size=model_size,
@@ -25,8 +28,9 @@ async def create_job(
         webhook_url=webhook_url,
     )
     session.add(job)
+    # Sin refresh: los defaults de las columnas (id, status, created_at...) se
+    # calculan en Python y el INSERT ya los deja cargados en el objeto
     await session.commit()
-    await session.refresh(job)
     return job
 
 
@@ -43,34 +47,81 @@ async def update_job_status(
     progress: int | None = None,
     **kwargs,
 ) -> Job | None:
-    """Actualiza el estado de un job."""
+    """
+    Actualiza el estado de un job.
+
+    Los estados intermedios se escriben con un solo UPDATE ... RETURNING (sin
+    leer el job antes). Los finales (COMPLETED/FAILED) cargan el job porque
+    processing_time depende de started_at.
+    """
+    if status not in (JobStatus.COMPLETED, JobStatus.FAILED):
+        return await _set_job_status(session, job_id, status, progress, **kwargs)
+
     job = await get_job(session, job_id)
     if not job:
         return None
 
+    _finish_job(job, status, progress, **kwargs)
+    await session.commit()
+    return job
+
+
+def _finish_job(job: Job, status: JobStatus, progress: int | None = None, **kwargs) -> None:
+    """Aplica un estado final (COMPLETED/FAILED) a un job cargado, sin commit."""
     job.status = status.value
 
     if progress is not None:
         job.progress = progress
 
-    if status == JobStatus.PROCESSING and job.started_at is None:
-        job.started_at = datetime.utcnow()
-
-    if status in (JobStatus.COMPLETED, JobStatus.FAILED):
-        completed = datetime.utcnow()
-        job.completed_at = completed
-        if job.started_at:
-            # Strip tzinfo to avoid naive vs aware mismatch from SQLite
-            started = job.started_at.replace(tzinfo=None)
-            delta = completed - started
-            job.processing_time = delta.total_seconds()
+    completed = datetime.utcnow()
+    job.completed_at = completed
+    if job.started_at:
+        # Strip tzinfo to avoid naive vs aware mismatch from SQLite
+        started = job.started_at.replace(tzinfo=None)
+        delta = completed - started
+        job.processing_time = delta.total_seconds()
 
     for key, value in kwargs.items():
         if hasattr(job, key):
             setattr(job, key, value)
 
+
+async def _set_job_status(
+    session: AsyncSession,
+    job_id: str,
+    status: JobStatus,
+    progress: int | None = None,
+    **kwargs,
+) -> Job | None:
+    """Estado intermedio en un solo statement; started_at solo se fija la primera vez."""
+    values: dict[str, Any] = {"status": status.value}
+    if progress is not None:
+        values["progress"] = progress
+    if status == JobStatus.PROCESSING:
+        values["started_at"] = func.coalesce(Job.started_at, datetime.utcnow())
+    values.update((key, value) for key, value in kwargs.items() if key in Job.__table__.c)
+
+    result = await session.execute(
+        update(Job).where(Job.id == job_id).values(**values).returning(Job)
+    )
+    job = result.scalar_one_or_none()
+    await session.commit()
+    return job
+
+
+async def update_job_progress(session: AsyncSession, job: Job, progress: int) -> Job:
+    """
+    Marca el progreso de un job en proceso ya cargado en la sesión.
+
+    Para los ticks de progreso del worker: muta el objeto que el worker ya
+    tiene y hace un solo commit, sin volver a leer el job antes ni después.
+    """
+    job.status = JobStatus.PROCESSING.value
+    job.progress = progress
+    if job.started_at is None:
+        job.started_at = datetime.utcnow()
+
     await session.commit()
-    await session.refresh(job)
     return job
 
 
@@ -82,30 +133,70 @@ async def complete_job(
     json_file_path: str,
     notes_detected: int,
     audio_duration: float,
+    job: Job | None = None,
 ) -> Job | None:
-    """Marca un job como completado con sus resultados."""
-    return await update_job_status(
-        session,
-        job_id,
-        JobStatus.COMPLETED,
-        progress=100,
-        result_data=result_data,
-        midi_file_path=midi_file_path,
-        json_file_path=json_file_path,
-        notes_detected=notes_detected,
-        audio_duration=audio_duration,
-    )
+    """
+    Marca un job como completado con sus resultados.
+
+    Si el caller ya tiene el job cargado en la sesión (el worker), se muta y
+    se escribe con un solo UPDATE sin volver a leerlo.
+    """
+    results = {
+        "result_data": result_data,
+        "midi_file_path": midi_file_path,
+        "json_file_path": json_file_path,
+        "notes_detected": notes_detected,
+        "audio_duration": audio_duration,
+    }
+    if job is None:
+        return await update_job_status(
+            session, job_id, JobStatus.COMPLETED, progress=100, **results,
+        )
+
+    _finish_job(job, JobStatus.COMPLETED, progress=100, **results)
+    await session.commit()
+    return job
 
 
 async def fail_job(
     session: AsyncSession,
     job_id: str,
     error_message: str,
+    started_at: datetime | None = None,
 ) -> Job | None:
-    """Marca un job como fallido."""
-    return await update_job_status(
-        session,
-        job_id,
-        JobStatus.FAILED,
-        error_message=error_message,
+    """
+    Marca un job como fallido.
+
+    Si el caller ya conoce started_at (el worker tiene el job cargado), todo
+    se escribe en un solo UPDATE sin leer el job; si no, se lee para calcular
+    processing_time.
+    """
+    if started_at is None:
+        return await update_job_status(
+            session,
+            job_id,
+            JobStatus.FAILED,
+            error_message=error_message,
+        )
+
+    completed = datetime.utcnow()
+    result = await session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(
+            status=JobStatus.FAILED.value,
+            error_message=error_message,
+            completed_at=completed,
+            processing_time=(completed - started_at.replace(tzinfo=None)).total_seconds(),
+        )
+        .returning(Job)
     )
+    job = result.scalar_one_or_none()
+    await session.commit()
+    return job
+
+
+async def mark_webhook_sent(session: AsyncSession, job_id: str) -> None:
+    """Marca el webhook de un job como entregado (un solo UPDATE, sin leer el job)."""
+    await session.execute(update(Job).where(Job.id == job_id).values(webhook_sent=1))
+    await session.commit()
@@ -1,7 +1,7 @@
 """Interfaz abstracta de almacenamiento."""
 
 from abc import ABC, abstractmethod
-from pathlib import Path
+from collections.abc import AsyncIterator
 
 
 class StorageBackend(ABC):
@@ -17,6 +17,11 @@ class StorageBackend(ABC):
         """Lee datos desde una ruta."""
         ...
 
+    @abstractmethod
+    def open_stream(self, path: str, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+        """Lee datos desde una ruta por bloques de hasta chunk_size bytes."""
+        ...
+
     @abstractmethod
     async def delete(self, path: str) -> None:
         """Elimina un archivo."""
@@ -1,11 +1,18 @@
 """Almacenamiento en sistema de archivos local."""
 
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator, Awaitable, Callable
 from pathlib import Path
 
 import aiofiles
 
-from src.storage.base import StorageBackend
 from src.core.config import settings
+from src.core.exceptions import FileTooLargeError
+from src.storage.base import StorageBackend
+
+# Tamaño de chunk al copiar uploads a disco
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
 
 class LocalStorage(StorageBackend):
@@ -14,21 +21,41 @@ class LocalStorage(StorageBackend):
     def __init__(self, base_path: str | None = None):
         self.base_path = Path(base_path or settings.STORAGE_PATH)
         self.base_path.mkdir(parents=True, exist_ok=True)
+        # Directorios ya creados en este proceso: mkdir(parents=True) hace un
+        # stat por ancestro y los directorios nunca se borran en runtime
+        self._created_dirs: set[Path] = {self.base_path}
 
     def _resolve(self, folder: str, filename: str) -> Path:
         path = self.base_path / folder / filename
-        path.parent.mkdir(parents=True, exist_ok=True)
+        parent = path.parent
+        if parent not in self._created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(parent)
         return path
 
     async def save(self, data: bytes, filename: str, folder: str = "") -> str:
+        # Los datos ya están en memoria: open + write + close en un solo salto
+        # a thread (aiofiles hace uno por operación). aiofiles queda para los
+        # uploads, que se escriben por chunks
         path = self._resolve(folder, filename)
-        async with aiofiles.open(path, "wb") as f:
-            await f.write(data)
+        await asyncio.to_thread(path.write_bytes, data)
         return str(path)
 
     async def read(self, path: str) -> bytes:
+        return await asyncio.to_thread(Path(path).read_bytes)
+
+    async def open_stream(
+        self, path: str, chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        # Para archivos grandes: nunca hay más de chunk_size bytes en RAM.
+        # Las respuestas HTTP usan local_path + FileResponse (sendfile)
         async with aiofiles.open(path, "rb") as f:
-            return await f.read()
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+    def local_path(self, path: str) -> Path:
+        """Ruta en disco de un archivo guardado, para servirlo con FileResponse."""
+        return Path(path).resolve()
 
     async def delete(self, path: str) -> None:
         p = Path(path)
@@ -42,6 +69,61 @@ class LocalStorage(StorageBackend):
         """Guarda un archivo subido por el usuario."""
         return await self.save(data, filename, folder=f"uploads/{job_id}")
 
+    async def save_upload_stream(
+        self,
+        read: Callable[[int], Awaitable[bytes]],
+        job_id: str,
+        filename: str,
+        max_size: int,
+    ) -> tuple[str, int]:
+        """
+        Guarda un archivo subido copiándolo a disco por chunks.
+
+        La memoria usada no depende del tamaño del archivo: nunca hay más de
+        UPLOAD_CHUNK_SIZE bytes en RAM.
+
+        Args:
+            read: Función async que lee hasta n bytes (ej: UploadFile.read)
+            job_id: ID del job dueño del archivo
+            filename: Nombre del archivo
+            max_size: Tamaño máximo en bytes
+
+        Returns:
+            Tupla (ruta, bytes escritos)
+
+        Raises:
+            FileTooLargeError: Si el archivo supera max_size (se borra lo escrito)
+        """
+        path = self._resolve(f"uploads/{job_id}", filename)
+        size = 0
+        try:
+            async with aiofiles.open(path, "wb") as f:
+                while chunk := await read(UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(
+                            f"Archivo demasiado grande: más de {max_size} bytes"
+                        )
+                    await f.write(chunk)
+        except BaseException:
+            await self.discard_upload(str(path))
+            raise
+        return str(path), size
+
+    async def discard_upload(self, path: str) -> None:
+        """
+        Borra un upload rechazado y su carpeta uploads/<job_id>/ si queda vacía.
+
+        La carpeta sale del cache de directorios creados para que un nuevo
+        upload con el mismo job_id la vuelva a crear.
+        """
+        await self.delete(path)
+        folder = Path(path).parent
+        self._created_dirs.discard(folder)
+        # Si ya no existe o todavía tiene archivos, se deja como está
+        with contextlib.suppress(OSError):
+            folder.rmdir()
+
     async def save_result(self, data: bytes, job_id: str, filename: str) -> str:
         """Guarda un archivo de resultado."""
         return await self.save(data, filename, folder=f"results/{job_id}")
@@ -2,21 +2,72 @@
 Utilidades para conversión entre frecuencias, notas MIDI y nombres de notas.
 """
 
-import numpy as np
+import math
 
+import numpy as np
 
-def hz_to_midi(frequency: float) -> int:
+PITCH_CLASSES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# Nombre precomputado para cada número MIDI 0-127 ("C-1" ... "G9"). Los hot
+# paths que ya tienen el número acotado a 0-127 indexan la tabla directamente.
+# Se recorre octava por octava: número MIDI = 12 * (octava + 1) + pitch class
+MIDI_NOTE_NAMES = tuple(
+    pitch_class + octave
+    for octave in ("-1", "0", "1", "2", "3", "4", "5", "6", "7", "8", "9")
+    for pitch_class in PITCH_CLASSES
+)[:128]
+
+# La misma tabla como array object: convierte una columna de números MIDI
+# completa con un solo gather (MIDI_NOTE_NAMES_ARRAY[midi].tolist())
+MIDI_NOTE_NAMES_ARRAY = np.array(MIDI_NOTE_NAMES, dtype=object)
+
+# Semitono (C = 0) de cada nombre de nota normalizado, sostenidos y bemoles
+_NOTE_SEMITONES = {
+    "C": 0,
+    "C#": 1,
+    "DB": 1,
+    "D": 2,
+    "D#": 3,
+    "EB": 3,
+    "E": 4,
+    "F": 5,
+    "F#": 6,
+    "GB": 6,
+    "G": 7,
+    "G#": 8,
+    "AB": 8,
+    "A": 9,
+    "A#": 10,
+    "BB": 10,
+    "B": 11,
+}
+
+# Número MIDI de cada nombre válido ya normalizado ("C0" ... "G9", con
+# sostenidos y bemoles): una sola búsqueda en lugar de separar nota y octava
+_NOTE_NAME_TO_MIDI = {
+    f"{name}{octave}": (octave + 1) * 12 + semitone
+    for name, semitone in _NOTE_SEMITONES.items()
+    for octave in range(10)
+    if (octave + 1) * 12 + semitone <= 127
+}
+
+
+def hz_to_midi(frequency: float | np.ndarray) -> int | np.ndarray:
     """
     Convierte frecuencia en Hz a número de nota MIDI.
 
     Formula: MIDI = 69 + 12 * log2(frequency / 440)
     Donde 69 es A4 (440 Hz)
 
+    Un ndarray (pitch track completo) se convierte en una sola pasada con
+    hz_to_midi_array en lugar de una llamada por frame.
+
     Args:
-        frequency: Frecuencia en Hz
+        frequency: Frecuencia en Hz, o array de frecuencias
 
     Returns:
-        Número de nota MIDI (0-127)
+        Número de nota MIDI (0-127). Para un ndarray, array int16 con -1 en
+        los frames sin voz (frecuencia <= 0), como hz_to_midi_array
 
     Example:
         >>> hz_to_midi(440.0)
@@ -24,16 +75,57 @@ def hz_to_midi(frequency: float) -> int:
         >>> hz_to_midi(261.63)
         60  # C4
     """
+    if isinstance(frequency, np.ndarray):
+        return hz_to_midi_array(frequency)
+
     if frequency <= 0:
         raise ValueError(f"frequency debe ser > 0, recibido: {frequency}")
 
-    midi = 69 + 12 * np.log2(frequency / 440.0)
-    midi_number = int(round(midi))
+    # math.log2 sobre un float: sin el dispatch de ufunc ni el escalar de
+    # numpy. round() devuelve el int directo (redondeo al par, igual que
+    # np.rint en hz_to_midi_array)
+    midi_number = round(69 + 12 * math.log2(frequency / 440.0))
 
     # Clamp a rango válido MIDI (0-127)
     return max(0, min(127, midi_number))
 
 
+def hz_to_midi_array(frequencies: np.ndarray) -> np.ndarray:
+    """
+    Convierte un array de frecuencias en Hz a números MIDI en una sola pasada.
+
+    Versión vectorizada de hz_to_midi para pitch tracks completos: un solo
+    np.log2 sobre el array en lugar de una llamada por frame.
+
+    Args:
+        frequencies: Array de frecuencias en Hz
+
+    Returns:
+        Array int16 con números MIDI (0-127). Las frecuencias <= 0 (frames
+        sin voz) se marcan con -1.
+
+    Example:
+        >>> hz_to_midi_array(np.array([440.0, 261.63, 0.0]))
+        array([69, 60, -1], dtype=int16)
+    """
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    voiced = frequencies > 0
+
+    # Una sola copia de los frames con voz; el resto de la expresión se evalúa
+    # in-place sobre ella, sin un temporal por operación
+    semitones = frequencies[voiced]
+    semitones /= 440.0
+    np.log2(semitones, out=semitones)
+    semitones *= 12.0
+    semitones += 69.0
+    np.rint(semitones, out=semitones)
+    np.clip(semitones, 0, 127, out=semitones)
+
+    midi = np.full(frequencies.shape, -1, dtype=np.int16)
+    midi[voiced] = semitones
+    return midi
+
+
 def midi_to_hz(midi_number: int) -> float:
     """
     Convierte número de nota MIDI a frecuencia en Hz.
@@ -83,11 +175,7 @@ def midi_to_note_name(midi_number: int) -> str:
             f"midi_number debe estar entre 0 y 127, recibido: {midi_number}"
         )
 
-    notes = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-    octave = (midi_number // 12) - 1
-    note = notes[midi_number % 12]
-
-    return f"{note}{octave}"
+    return MIDI_NOTE_NAMES[midi_number]
 
 
 def note_name_to_midi(note_name: str) -> int:
@@ -113,28 +201,11 @@ def note_name_to_midi(note_name: str) -> int:
     # Normalizar entrada
     note_name = note_name.strip().upper()
 
-    # Mapa de notas a semitonos (C = 0)
-    note_map = {
-        "C": 0,
-        "C#": 1,
-        "DB": 1,
-        "D": 2,
-        "D#": 3,
-        "EB": 3,
-        "E": 4,
-        "F": 5,
-        "F#": 6,
-        "GB": 6,
-        "G": 7,
-        "G#": 8,
-        "AB": 8,
-        "A": 9,
-        "A#": 10,
-        "BB": 10,
-        "B": 11,
-    }
-
-    # Extraer nota y octava
+    midi_number = _NOTE_NAME_TO_MIDI.get(note_name)
+    if midi_number is not None:
+        return midi_number
+
+    # Fuera de la tabla: extraer nota y octava para dar el error específico
     if len(note_name) == 2:  # Ej: "C4"
         note, octave_str = note_name[0], note_name[1]
     elif len(note_name) == 3:  # Ej: "C#4" o "Bb4"
@@ -142,16 +213,16 @@ def note_name_to_midi(note_name: str) -> int:
     else:
         raise ValueError(f"Formato de nota inválido: {note_name}")
 
-    if note not in note_map:
+    if note not in _NOTE_SEMITONES:
         raise ValueError(f"Nota no reconocida: {note}")
 
     try:
         octave = int(octave_str)
     except ValueError:
-        raise ValueError(f"Octava inválida: {octave_str}")
+        raise ValueError(f"Octava inválida: {octave_str}") from None
 
     # Calcular MIDI number
-    midi_number = (octave + 1) * 12 + note_map[note]
+    midi_number = (octave + 1) * 12 + _NOTE_SEMITONES[note]
 
     if not 0 <= midi_number <= 127:
         raise ValueError(
@@ -1,33 +1,144 @@
 """
 Worker de procesamiento de audio.
 
-Ejecuta el procesamiento pesado (torch/CREPE) en un thread separado
-para no bloquear el event loop de FastAPI.
+Ejecuta el procesamiento pesado (torch/CREPE) en un pool de procesos
+para no bloquear el event loop de FastAPI y repartir los jobs entre cores.
 """
 
 import asyncio
+import multiprocessing
+import os
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 import httpx
 
-from src.audio.loader import load_audio, get_audio_info
-from src.audio.preprocessor import preprocess_audio, compute_frame_energy, compute_energy_threshold
-from src.audio.pitch_detector import detect_pitches
-from src.audio.pitch_post_processor import post_process_pitch
+from src.audio.json_formatter import format_result, serialize_result
+from src.audio.key_detector import filter_key_outliers, format_key_info
+from src.audio.loader import get_audio_info, load_audio
+from src.audio.midi_generator import build_midi
 from src.audio.note_segmenter import (
-    segment_notes, merge_same_pitch_notes, refine_onsets, filter_short_notes,
+    filter_short_notes,
+    merge_same_pitch_notes,
+    refine_onsets,
+    segment_notes,
 )
-from src.audio.key_detector import filter_key_outliers, format_key_info
-from src.audio.midi_generator import generate_midi
-from src.audio.json_formatter import format_result, save_json
-from src.core.config import settings
-from src.core.security import generate_webhook_signature
+from src.audio.pitch_detector import detect_pitches, preload_models, warmup_models
+from src.audio.pitch_post_processor import post_process_pitch
+from src.audio.preprocessor import (
+    compute_energy_threshold,
+    compute_frame_energy,
+    compute_onset_envelope,
+    preprocess_audio,
+)
+from src.core.config import ModelSize, settings
+from src.core.security import serialize_webhook_payload, sign_webhook_body
 from src.db.base import async_session
-from src.db.models.job import JobStatus
 from src.db.repositories.job_repo import (
-    get_job, update_job_status, complete_job, fail_job,
+    complete_job,
+    fail_job,
+    get_job,
+    mark_webhook_sent,
+    update_job_progress,
 )
+from src.storage.local import storage
+
+# Pool de procesos para las etapas pesadas (se crea en el arranque de la API)
+_executor: ProcessPoolExecutor | None = None
+# Tras shutdown_executor el pool no se vuelve a crear (una etapa tardía falla
+# su job en lugar de levantar procesos nuevos que nadie cerraría)
+_shutting_down = False
+
+# Cliente HTTP compartido de los webhooks: reutiliza conexiones keep-alive
+# (TCP + TLS) entre reintentos y jobs. Se crea con el primer webhook
+_webhook_client: httpx.AsyncClient | None = None
+
+
+def start_executor() -> ProcessPoolExecutor:
+    """
+    Crea el pool de procesos de los jobs (uno por job concurrente).
+
+    Usa "spawn": CUDA no se puede reinicializar en un proceso hecho con fork.
+    Cada proceso reparte los threads de torch y precarga los modelos de
+    settings.CREPE_WARMUP_MODELS (o los pesos del modelo por defecto) al arrancar.
+
+    Raises:
+        RuntimeError: Si el pool ya se cerró con shutdown_executor
+    """
+    global _executor
+    if _shutting_down:
+        raise RuntimeError("El pool de procesos está cerrado (shutdown en curso)")
+    if _executor is None:
+        n_workers = max(1, settings.MAX_CONCURRENT_JOBS)
+        _executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=(n_workers,),
+        )
+    return _executor
+
+
+async def shutdown_executor() -> None:
+    """
+    Cierra el pool de procesos sin bloquear el event loop.
+
+    Solo espera a las etapas en ejecución: el caller espera antes a los jobs
+    en curso. Desde aquí start_executor ya no crea un pool nuevo.
+    """
+    global _executor, _shutting_down
+    _shutting_down = True
+    if _executor is not None:
+        executor, _executor = _executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True)
+
+
+async def warmup_executor() -> None:
+    """Arranca todos los procesos del pool (y su precarga de modelos) antes del primer job."""
+    executor = start_executor()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, os.getpid)
+        for _ in range(max(1, settings.MAX_CONCURRENT_JOBS))
+    ))
+
+
+def _get_webhook_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP de los webhooks, creándolo en el primer uso."""
+    global _webhook_client
+    if _webhook_client is None:
+        _webhook_client = httpx.AsyncClient(timeout=settings.WEBHOOK_TIMEOUT)
+    return _webhook_client
+
+
+async def close_webhook_client() -> None:
+    """Cierra el cliente HTTP de los webhooks y sus conexiones abiertas."""
+    global _webhook_client
+    if _webhook_client is not None:
+        await _webhook_client.aclose()
+        _webhook_client = None
+
+
+def _init_process(n_workers: int) -> None:
+    """Inicializa un proceso del pool: threads de torch y modelos precargados."""
+    import torch
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // n_workers))
+
+    # Modelos configurados: inferencia completa de warm-up. Si no hay, al
+    # menos los pesos del modelo por defecto quedan en el cache del proceso
+    if settings.CREPE_WARMUP_MODELS:
+        warmup_models(settings.CREPE_WARMUP_MODELS)
+    else:
+        preload_models([settings.DEFAULT_MODEL_SIZE])
+
+
+async def _run_stage(func, *args):
+    """Ejecuta una etapa en el pool de procesos sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(start_executor(), func, *args)
 
 
 def _stage_load(audio_file_path: str):
@@ -35,16 +146,18 @@ def _stage_load(audio_file_path: str):
     info = get_audio_info(audio_file_path)
     audio, sr = load_audio(audio_file_path, target_sr=16000, mono=True)
     audio, trim_offset = preprocess_audio(audio, sr)
-    return info, audio, sr, trim_offset
+    energy = compute_frame_energy(audio, sr)
+    onset_envelope = compute_onset_envelope(audio, sr) if settings.ONSET_SPECTRAL_FLUX else None
+    return info, audio, sr, trim_offset, energy, onset_envelope
 
 
-def _stage_detect(audio, sr, model_size: str):
+def _stage_detect(audio, sr, energy, model_size: ModelSize):
     """Stage 2: Detect pitch (heaviest step — torch/CREPE)."""
     frames = detect_pitches(
         audio, sr, model_size=model_size,
-        batch_size=settings.CREPE_BATCH_SIZE,
         fmin=settings.CREPE_FMIN,
         fmax=settings.CREPE_FMAX,
+        energy=energy,
     )
     frames = post_process_pitch(
         frames,
@@ -55,9 +168,8 @@ def _stage_detect(audio, sr, model_size: str):
     return frames
 
 
-def _stage_segment(frames, audio, sr, trim_offset: float, confidence_threshold: float):
+def _stage_segment(frames, energy, onset_envelope, trim_offset: float, confidence_threshold: float):
     """Stage 3: Segment, merge, filter notes + key detection."""
-    energy = compute_frame_energy(audio, sr)
     threshold = compute_energy_threshold(energy)
     notes = segment_notes(
         frames, energy=energy, energy_threshold=threshold,
@@ -68,6 +180,7 @@ def _stage_segment(frames, audio, sr, trim_offset: float, confidence_threshold:
     notes = refine_onsets(
         notes, energy=energy, time_offset=trim_offset,
         lookback_frames=settings.ONSET_LOOKBACK_FRAMES,
+        onset_envelope=onset_envelope,
     )
     notes = filter_short_notes(notes, min_duration=settings.POST_MERGE_MIN_DURATION)
     notes, section_keys = filter_key_outliers(notes)
@@ -76,14 +189,8 @@ def _stage_segment(frames, audio, sr, trim_offset: float, confidence_threshold:
 
 
 def _stage_output(notes, key_info, info: dict, audio_filename: str, model_size: str,
-                  confidence_threshold: float, job_id: str):
-    """Stage 4: Generate MIDI, JSON outputs."""
-    results_dir = Path(settings.STORAGE_PATH) / "results" / job_id
-    results_dir.mkdir(parents=True, exist_ok=True)
-
-    stem = Path(audio_filename or "output").stem
-    midi_path = generate_midi(notes, results_dir / f"{stem}.mid")
-
+                  confidence_threshold: float):
+    """Stage 4: Generate MIDI, JSON outputs (en memoria; se guardan en el event loop)."""
     result_data = format_result(
         notes=notes,
         audio_duration=info["duration"],
@@ -92,12 +199,11 @@ def _stage_output(notes, key_info, info: dict, audio_filename: str, model_size:
         input_file=audio_filename,
         key_info=key_info,
     )
-    json_path = save_json(result_data, results_dir / f"{stem}.json")
 
     return {
         "result_data": result_data,
-        "midi_file_path": str(midi_path),
-        "json_file_path": str(json_path),
+        "midi_bytes": build_midi(notes),
+        "json_bytes": serialize_result(result_data),
         "notes_detected": len(notes),
         "audio_duration": info["duration"],
     }
@@ -107,9 +213,10 @@ async def process_audio_job(job_id: str) -> None:
     """
     Procesa un job de audio en etapas con progreso real.
 
-    Cada etapa pesada se ejecuta en un thread separado
-    para no bloquear el event loop de FastAPI.
+    Cada etapa pesada se ejecuta en el pool de procesos, así que el event
+    loop de FastAPI sigue atendiendo requests y varios jobs usan varios cores.
     """
+    job = None
     async with async_session() as session:
         try:
             job = await get_job(session, job_id)
@@ -117,28 +224,36 @@ async def process_audio_job(job_id: str) -> None:
                 return
 
             # 10% — Loading audio
-            await update_job_status(session, job_id, JobStatus.PROCESSING, progress=10)
-            info, audio, sr, trim_offset = await asyncio.to_thread(
+            await update_job_progress(session, job, 10)
+            info, audio, sr, trim_offset, energy, onset_envelope = await _run_stage(
                 _stage_load, job.audio_file_path,
             )
 
             # 30% — Detecting pitch (heaviest step)
-            await update_job_status(session, job_id, JobStatus.PROCESSING, progress=30)
-            frames = await asyncio.to_thread(
-                _stage_detect, audio, sr, job.model_size,
+            await update_job_progress(session, job, 30)
+            frames = await _run_stage(
+                _stage_detect, audio, sr, energy, job.model_size,
             )
 
             # 60% — Segmenting notes
-            await update_job_status(session, job_id, JobStatus.PROCESSING, progress=60)
-            notes, key_info = await asyncio.to_thread(
-                _stage_segment, frames, audio, sr, trim_offset, job.confidence_threshold,
+            await update_job_progress(session, job, 60)
+            notes, key_info = await _run_stage(
+                _stage_segment, frames, energy, onset_envelope, trim_offset,
+                job.confidence_threshold,
             )
 
             # 90% — Generating outputs
-            await update_job_status(session, job_id, JobStatus.PROCESSING, progress=90)
-            result = await asyncio.to_thread(
+            await update_job_progress(session, job, 90)
+            result = await _run_stage(
                 _stage_output, notes, key_info, info, job.audio_filename,
-                job.model_size, job.confidence_threshold, job_id,
+                job.model_size, job.confidence_threshold,
+            )
+
+            # MIDI y JSON son independientes: se escriben en paralelo
+            stem = Path(job.audio_filename or "output").stem
+            midi_file_path, json_file_path = await asyncio.gather(
+                storage.save_result(result["midi_bytes"], job_id, f"{stem}.mid"),
+                storage.save_result(result["json_bytes"], job_id, f"{stem}.json"),
             )
 
             # 100% — Complete
@@ -146,19 +261,24 @@ async def process_audio_job(job_id: str) -> None:
                 session,
                 job_id,
                 result_data=result["result_data"],
-                midi_file_path=result["midi_file_path"],
-                json_file_path=result["json_file_path"],
+                midi_file_path=midi_file_path,
+                json_file_path=json_file_path,
                 notes_detected=result["notes_detected"],
                 audio_duration=result["audio_duration"],
+                job=job,
             )
 
             # Enviar webhook si configurado
-            if job.webhook_url:
-                await _send_webhook(job_id, job.webhook_url, result["result_data"])
+            webhook_url = job.webhook_url
+            if webhook_url:
+                await _send_webhook(job_id, webhook_url, result["result_data"])
 
         except Exception as e:
+            # Sesión nueva (la del job puede haber quedado inválida); con el
+            # started_at en memoria el fallo se escribe sin leer el job
+            started_at: datetime | None = job.started_at if job is not None else None
             async with async_session() as err_session:
-                await fail_job(err_session, job_id, str(e))
+                await fail_job(err_session, job_id, str(e), started_at=started_at)
             traceback.print_exc()
 
 
@@ -173,7 +293,9 @@ async def _send_webhook(job_id: str, webhook_url: str, result_data: dict) -> Non
         },
     }
 
-    signature = generate_webhook_signature(payload, settings.WEBHOOK_SECRET_KEY)
+    # Se envían exactamente los bytes firmados: el receptor verifica el body crudo
+    body = serialize_webhook_payload(payload)
+    signature = sign_webhook_body(body, settings.WEBHOOK_SECRET_KEY)
 
     headers = {
         "Content-Type": "application/json",
@@ -182,17 +304,14 @@ async def _send_webhook(job_id: str, webhook_url: str, result_data: dict) -> Non
         "User-Agent": "Music2Notes/1.0",
     }
 
+    client = _get_webhook_client()
     for attempt in range(settings.WEBHOOK_MAX_RETRIES):
         try:
-            async with httpx.AsyncClient(timeout=settings.WEBHOOK_TIMEOUT) as client:
-                response = await client.post(webhook_url, json=payload, headers=headers)
-                if response.status_code < 300:
-                    async with async_session() as session:
-                        job = await get_job(session, job_id)
-                        if job:
-                            job.webhook_sent = 1
-                            await session.commit()
-                    return
+            response = await client.post(webhook_url, content=body, headers=headers)
+            if response.status_code < 300:
+                async with async_session() as session:
+                    await mark_webhook_sent(session, job_id)
+                return
         except Exception:
             pass
 
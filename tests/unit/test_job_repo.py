@@ -0,0 +1,140 @@
+"""Tests de los UPDATE … RETURNING del repositorio de jobs sobre SQLite en memoria."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.db.base import Base
+from src.db.models.job import JobStatus
+from src.db.repositories import job_repo
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session(engine):
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as session:
+        yield session
+
+
+@pytest.fixture
+def statements(engine):
+    """Statements SQL ejecutados (primera palabra), para contar round-trips."""
+    executed: list[str] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement.split(None, 1)[0].upper())
+
+    return executed
+
+
+async def new_job(session: AsyncSession, **kwargs):
+    return await job_repo.create_job(session, "/tmp/in.wav", "in.wav", **kwargs)
+
+
+async def reload(session: AsyncSession, job_id: str):
+    session.expunge_all()
+    return await job_repo.get_job(session, job_id)
+
+
+async def test_set_job_status_single_update(session, statements):
+    job = await new_job(session)
+    statements.clear()
+
+    updated = await job_repo._set_job_status(
+        session, job.id, JobStatus.PROCESSING, progress=10, not_a_column="ignorado",
+    )
+
+    assert statements == ["UPDATE"]
+    assert updated.status == JobStatus.PROCESSING.value
+    assert updated.progress == 10
+    assert isinstance(updated.started_at, datetime)
+
+    stored = await reload(session, job.id)
+    assert stored.status == JobStatus.PROCESSING.value
+    assert stored.started_at == updated.started_at
+
+
+async def test_set_job_status_keeps_first_started_at(session):
+    job = await new_job(session)
+    first = await job_repo._set_job_status(session, job.id, JobStatus.PROCESSING, progress=10)
+    started_at = first.started_at
+
+    second = await job_repo._set_job_status(session, job.id, JobStatus.PROCESSING, progress=50)
+
+    assert second.progress == 50
+    assert second.started_at == started_at
+
+
+async def test_set_job_status_missing_job(session):
+    assert await job_repo._set_job_status(session, "no-existe", JobStatus.PROCESSING) is None
+
+
+async def test_finish_job_sets_processing_time(session):
+    job = await new_job(session)
+    job.started_at = datetime.utcnow() - timedelta(seconds=5)
+
+    job_repo._finish_job(job, JobStatus.COMPLETED, progress=100, notes_detected=7)
+    await session.commit()
+
+    stored = await reload(session, job.id)
+    assert stored.status == JobStatus.COMPLETED.value
+    assert stored.progress == 100
+    assert stored.notes_detected == 7
+    assert stored.completed_at is not None
+    assert stored.processing_time == pytest.approx(5.0, abs=1.0)
+
+
+async def test_finish_job_without_started_at(session):
+    job = await new_job(session)
+
+    job_repo._finish_job(job, JobStatus.FAILED, error_message="boom")
+
+    assert job.status == JobStatus.FAILED.value
+    assert job.completed_at is not None
+    assert job.processing_time is None
+    assert job.error_message == "boom"
+
+
+async def test_fail_job_with_started_at_single_update(session, statements):
+    job = await new_job(session)
+    started_at = datetime.utcnow() - timedelta(seconds=3)
+    statements.clear()
+
+    failed = await job_repo.fail_job(session, job.id, "boom", started_at=started_at)
+
+    assert statements == ["UPDATE"]
+    assert failed.status == JobStatus.FAILED.value
+    assert failed.error_message == "boom"
+    assert failed.processing_time == pytest.approx(3.0, abs=1.0)
+
+    stored = await reload(session, job.id)
+    assert stored.status == JobStatus.FAILED.value
+    assert stored.completed_at == failed.completed_at
+
+
+async def test_fail_job_reads_started_at_when_not_given(session):
+    job = await new_job(session)
+    await job_repo._set_job_status(session, job.id, JobStatus.PROCESSING, progress=10)
+
+    failed = await job_repo.fail_job(session, job.id, "boom")
+
+    assert failed.status == JobStatus.FAILED.value
+    assert failed.error_message == "boom"
+    assert failed.processing_time is not None
+
+
+async def test_fail_job_missing_job(session):
+    assert await job_repo.fail_job(session, "no-existe", "boom", started_at=datetime.utcnow()) is None
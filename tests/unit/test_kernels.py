@@ -0,0 +1,275 @@
+"""Tests de los kernels numba contra referencias simples en numpy."""
+
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.audio.kernels import (
+    encode_midi_events,
+    frame_rms,
+    segment_runs,
+    smooth_pitch_segments,
+    window_histograms,
+)
+
+RNG = np.random.default_rng(0)
+
+
+# --- Referencias ---------------------------------------------------------
+
+
+def frame_rms_ref(audio: np.ndarray, hop: int) -> np.ndarray:
+    n_frames = len(audio) // hop + 1
+    energy = np.zeros(n_frames)
+    for f in range(n_frames):
+        chunk = audio[f * hop:(f + 1) * hop].astype(np.float64)
+        if len(chunk):
+            energy[f] = np.sqrt(np.mean(chunk ** 2))
+    return energy
+
+
+def segment_runs_ref(freqs, confs, energy, min_freq, conf_threshold, energy_threshold):
+    n = len(freqs)
+    # Frames sin energía solo se filtran por frecuencia y confianza
+    energy_ok = np.ones(n, dtype=bool)
+    energy_ok[:len(energy)] = energy[:n] > energy_threshold
+    padded_energy = np.zeros(n)
+    padded_energy[:len(energy)] = energy[:n]
+
+    valid = (freqs > min_freq) & (confs >= conf_threshold) & energy_ok
+    with np.errstate(divide="ignore", invalid="ignore"):
+        midi = np.clip(np.rint(69.0 + 12.0 * np.log2(freqs / 440.0)), 0, 127)
+    midi = np.where(valid, midi, -1).astype(np.int64)
+
+    bounds = np.flatnonzero(np.diff(midi, prepend=-2, append=-2))
+    runs = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:], strict=True) if midi[lo] >= 0]
+    return (
+        np.array([midi[lo] for lo, _ in runs], dtype=np.int64),
+        np.array([lo for lo, _ in runs], dtype=np.int64),
+        np.array([hi for _, hi in runs], dtype=np.int64),
+        np.array([freqs[lo:hi].sum() for lo, hi in runs]),
+        np.array([confs[lo:hi].sum() for lo, hi in runs]),
+        np.array([padded_energy[lo:hi].sum() for lo, hi in runs]),
+    )
+
+
+def window_histograms_ref(starts, ends, pcs, window_starts, window_seconds):
+    w_start = window_starts[:, None]
+    w_end = w_start + window_seconds
+    overlap = np.clip(np.minimum(ends, w_end) - np.maximum(starts, w_start), 0.0, None)
+    one_hot = np.zeros((len(pcs), 12))
+    one_hot[np.arange(len(pcs)), pcs] = 1.0
+    return overlap @ one_hot
+
+
+def smooth_pitch_segments_ref(freqs, seg_starts, seg_ends, median_window, smooth_window,
+                              std_threshold):
+    result = freqs.copy()
+    for start, end in zip(seg_starts, seg_ends, strict=True):
+        segment = freqs[start:end].copy()
+        n = len(segment)
+
+        # Borde "reflect" de scipy.ndimage = "symmetric" de numpy
+        if n >= median_window:
+            half = median_window // 2
+            padded = np.pad(segment, (half, median_window - 1 - half), mode="symmetric")
+            segment = np.median(sliding_window_view(padded, median_window), axis=1)
+            result[start:end] = segment
+        if n < smooth_window:
+            continue
+
+        half = smooth_window // 2
+        padded = np.pad(segment, (half, smooth_window - 1 - half), mode="symmetric")
+        smoothed = sliding_window_view(padded, smooth_window).mean(axis=1)
+        if n < 2 * smooth_window:
+            continue
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cents = 1200.0 * np.log2(segment / smoothed)
+        cents[~np.isfinite(cents)] = 0.0
+        half = smooth_window
+        std = np.array([cents[max(0, i - half):i + half + 1].std() for i in range(n)])
+        result[start:end] = np.where(std > std_threshold, smoothed, segment)
+    return result
+
+
+# --- frame_rms -----------------------------------------------------------
+
+
+@pytest.mark.parametrize("n_samples", [0, 1, 159, 160, 161, 1000])
+def test_frame_rms_matches_reference(n_samples):
+    audio = RNG.standard_normal(n_samples).astype(np.float32)
+    np.testing.assert_allclose(frame_rms(audio, 160), frame_rms_ref(audio, 160), rtol=1e-6)
+
+
+def test_frame_rms_empty_input():
+    energy = frame_rms(np.zeros(0, dtype=np.float32), 160)
+    np.testing.assert_array_equal(energy, [0.0])
+
+
+def test_frame_rms_nan_propagates_to_its_frame():
+    audio = np.ones(480, dtype=np.float32)
+    audio[200] = np.nan
+    energy = frame_rms(audio, 160)
+    assert np.isnan(energy[1])
+    np.testing.assert_array_equal(energy[[0, 2, 3]], [1.0, 1.0, 0.0])
+
+
+# --- segment_runs --------------------------------------------------------
+
+
+def assert_runs_equal(result, expected):
+    midi, starts, ends, freq_sums, conf_sums, energy_sums = result
+    assert midi.dtype == np.int16
+    assert starts.dtype == ends.dtype == np.int32
+    np.testing.assert_array_equal(midi, expected[0])
+    np.testing.assert_array_equal(starts, expected[1])
+    np.testing.assert_array_equal(ends, expected[2])
+    for got, want in zip((freq_sums, conf_sums, energy_sums), expected[3:], strict=True):
+        np.testing.assert_allclose(got, want, rtol=1e-12)
+
+
+def random_pitch_track(n_frames: int):
+    # Notas que se sostienen unos frames, con huecos de silencio y NaN
+    midi = np.repeat(RNG.integers(40, 80, n_frames // 8 + 1), 8)[:n_frames]
+    freqs = 440.0 * 2 ** ((midi - 69 + RNG.uniform(-0.3, 0.3, n_frames)) / 12)
+    freqs[RNG.random(n_frames) < 0.1] = 0.0
+    freqs[RNG.random(n_frames) < 0.05] = np.nan
+    confs = RNG.random(n_frames)
+    energy = RNG.random(n_frames) * 0.1
+    return freqs, confs, energy
+
+
+@pytest.mark.parametrize("n_energy", [None, 0, 50])
+def test_segment_runs_matches_reference(n_energy):
+    freqs, confs, energy = random_pitch_track(200)
+    if n_energy is not None:
+        energy = energy[:n_energy]
+    args = (freqs, confs, energy, 50.0, 0.3, 0.01)
+    assert_runs_equal(segment_runs(*args), segment_runs_ref(*args))
+
+
+def test_segment_runs_empty_input():
+    empty = np.zeros(0)
+    result = segment_runs(empty, empty, empty, 50.0, 0.3, 0.01)
+    assert all(len(column) == 0 for column in result)
+
+
+def test_segment_runs_single_frame():
+    args = (np.array([440.0]), np.array([0.9]), np.array([0.5]), 50.0, 0.3, 0.01)
+    result = segment_runs(*args)
+    assert_runs_equal(result, segment_runs_ref(*args))
+    assert result[0].tolist() == [69]
+
+
+def test_segment_runs_all_unvoiced():
+    freqs = np.array([0.0, np.nan, 30.0, 440.0])
+    confs = np.array([0.9, 0.9, 0.9, 0.1])
+    result = segment_runs(freqs, confs, np.ones(4), 50.0, 0.3, 0.01)
+    assert all(len(column) == 0 for column in result)
+
+
+# --- window_histograms ---------------------------------------------------
+
+
+def test_window_histograms_matches_reference():
+    starts = np.sort(RNG.uniform(0.0, 30.0, 100))
+    ends = starts + RNG.uniform(0.05, 3.0, 100)
+    pcs = RNG.integers(0, 12, 100)
+    window_starts = np.arange(0.0, 30.0, 2.5)
+    np.testing.assert_allclose(
+        window_histograms(starts, ends, pcs, window_starts, 5.0),
+        window_histograms_ref(starts, ends, pcs, window_starts, 5.0),
+        atol=1e-12,
+    )
+
+
+def test_window_histograms_empty_input():
+    empty = np.zeros(0)
+    no_pcs = np.zeros(0, dtype=np.int64)
+    assert window_histograms(empty, empty, no_pcs, empty, 5.0).shape == (0, 12)
+    np.testing.assert_array_equal(
+        window_histograms(empty, empty, no_pcs, np.array([0.0, 5.0]), 5.0), np.zeros((2, 12)),
+    )
+
+
+def test_window_histograms_single_note():
+    hist = window_histograms(
+        np.array([1.0]), np.array([4.0]), np.array([9]), np.array([0.0, 2.0, 10.0]), 2.0,
+    )
+    expected = np.zeros((3, 12))
+    expected[0, 9] = 1.0
+    expected[1, 9] = 2.0
+    np.testing.assert_array_equal(hist, expected)
+
+
+# --- smooth_pitch_segments -----------------------------------------------
+
+
+def test_smooth_pitch_segments_matches_reference():
+    n = 400
+    t = np.arange(n) * 0.01
+    # Segmento con vibrato fuerte, uno estable, uno corto y silencio (0/NaN) entre ellos
+    freqs = np.zeros(n)
+    freqs[10:150] = 440.0 * 2 ** (80.0 * np.sin(2 * np.pi * 6.0 * t[10:150]) / 1200)
+    freqs[160:300] = 220.0 * (1 + RNG.normal(0.0, 1e-3, 140))
+    freqs[305:312] = 330.0 + RNG.normal(0.0, 1.0, 7)
+    freqs[320:330] = np.nan
+    seg_starts = np.array([10, 160, 305])
+    seg_ends = np.array([150, 300, 312])
+
+    result = smooth_pitch_segments(freqs, seg_starts, seg_ends, 5, 13, 20.0)
+    expected = smooth_pitch_segments_ref(freqs, seg_starts, seg_ends, 5, 13, 20.0)
+    np.testing.assert_allclose(result, expected, rtol=1e-9)
+    # Los frames fuera de segmentos (incluidos los NaN) no se tocan
+    assert np.isnan(result[320:330]).all()
+    np.testing.assert_array_equal(result[:10], 0.0)
+
+
+def test_smooth_pitch_segments_no_segments():
+    freqs = np.array([0.0, np.nan, 440.0])
+    no_segments = np.zeros(0, dtype=np.int64)
+    result = smooth_pitch_segments(freqs, no_segments, no_segments, 5, 13, 20.0)
+    np.testing.assert_array_equal(result, freqs)
+
+
+def test_smooth_pitch_segments_single_frame_segment():
+    freqs = np.array([0.0, 440.0, 0.0])
+    result = smooth_pitch_segments(freqs, np.array([1]), np.array([2]), 5, 13, 20.0)
+    np.testing.assert_array_equal(result, freqs)
+
+
+# --- encode_midi_events --------------------------------------------------
+
+
+def encode_midi_events_ref(delta_ticks, kinds, pitches, velocities) -> bytes:
+    out = bytearray()
+    previous = -1
+    for delta, kind, pitch, velocity in zip(delta_ticks, kinds, pitches, velocities,
+                                            strict=True):
+        groups = [int(delta) & 0x7F]
+        delta = int(delta) >> 7
+        while delta:
+            groups.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out += bytes(reversed(groups))
+        if kind != previous:
+            out.append(0x90 if kind == 1 else 0x80)
+            previous = kind
+        out += bytes((int(pitch), int(velocity)))
+    return bytes(out)
+
+
+def test_encode_midi_events_matches_reference():
+    n = 300
+    deltas = RNG.choice([0, 1, 127, 128, 16383, 16384, 2_097_151, 2_097_152], n).astype(np.int64)
+    kinds = RNG.integers(0, 2, n).astype(np.uint8)
+    pitches = RNG.integers(0, 128, n).astype(np.uint8)
+    velocities = RNG.integers(0, 128, n).astype(np.uint8)
+    encoded = encode_midi_events(deltas, kinds, pitches, velocities)
+    assert encoded.tobytes() == encode_midi_events_ref(deltas, kinds, pitches, velocities)
+
+
+def test_encode_midi_events_empty_input():
+    empty = np.zeros(0, dtype=np.uint8)
+    assert len(encode_midi_events(np.zeros(0, dtype=np.int64), empty, empty, empty)) == 0
@@ -0,0 +1,150 @@
+"""Tests del writer SMF de build_midi, leyendo la salida con mido."""
+
+import io
+
+import mido
+import pytest
+
+from src.audio.midi_generator import build_midi, generate_midi
+from src.audio.models import Note, NoteArray
+
+# 128 BPM a 480 ticks/beat = 1024 ticks/s: los tiempos múltiplos de 1/1024 s
+# son exactos en float y caen justo en un tick
+TEMPO = 128
+TICKS_PER_BEAT = 480
+TICKS_PER_SECOND = 1024
+
+
+def make_note(midi_number: int, start_tick: int, length_ticks: int, velocity: int) -> Note:
+    """Nota con inicio y duración en ticks (Note.unchecked admite duración 0)."""
+    return Note.unchecked(
+        midi_number=midi_number,
+        note_name="X",
+        start_time=start_tick / TICKS_PER_SECOND,
+        duration=length_ticks / TICKS_PER_SECOND,
+        frequency=440.0,
+        confidence=0.9,
+        velocity=velocity,
+    )
+
+
+def parse(data: bytes) -> mido.MidiFile:
+    return mido.MidiFile(file=io.BytesIO(data))
+
+
+def note_events(data: bytes) -> list[tuple[int, str, int, int]]:
+    """(tick absoluto, tipo, nota, velocity) de cada note_on/note_off del track."""
+    midi = parse(data)
+    assert len(midi.tracks) == 1
+    events = []
+    tick = 0
+    for msg in midi.tracks[0]:
+        tick += msg.time
+        if msg.type in ("note_on", "note_off"):
+            events.append((tick, msg.type, msg.note, msg.velocity))
+    return events
+
+
+def test_empty_note_list():
+    data = build_midi([], tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+    midi = parse(data)
+
+    assert midi.type == 1
+    assert midi.ticks_per_beat == TICKS_PER_BEAT
+    assert [msg.type for msg in midi.tracks[0]] == ["set_tempo", "end_of_track"]
+    assert midi.tracks[0][0].tempo == mido.bpm2tempo(TEMPO)
+    assert note_events(data) == []
+
+
+def test_sequential_notes_times_and_velocities():
+    notes = [make_note(60, 0, 512, 100), make_note(62, 1024, 256, 64)]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert note_events(data) == [
+        (0, "note_on", 60, 100),
+        (512, "note_off", 60, 0),
+        (1024, "note_on", 62, 64),
+        (1280, "note_off", 62, 0),
+    ]
+
+
+def test_overlapping_notes():
+    notes = [make_note(60, 0, 1024, 90), make_note(64, 512, 1024, 70)]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert note_events(data) == [
+        (0, "note_on", 60, 90),
+        (512, "note_on", 64, 70),
+        (1024, "note_off", 60, 0),
+        (1536, "note_off", 64, 0),
+    ]
+
+
+def test_tied_notes_note_off_before_note_on():
+    # Misma nota repetida sin silencio: el note_off de la primera va antes que
+    # el note_on de la segunda en el mismo tick
+    notes = [make_note(60, 0, 512, 80), make_note(60, 512, 512, 100)]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert note_events(data) == [
+        (0, "note_on", 60, 80),
+        (512, "note_off", 60, 0),
+        (512, "note_on", 60, 100),
+        (1024, "note_off", 60, 0),
+    ]
+
+
+def test_zero_length_note():
+    notes = [make_note(60, 256, 0, 80), make_note(62, 512, 256, 90)]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert note_events(data) == [
+        (256, "note_off", 60, 0),
+        (256, "note_on", 60, 80),
+        (512, "note_on", 62, 90),
+        (768, "note_off", 62, 0),
+    ]
+
+
+@pytest.mark.parametrize("delta", [127, 128, 16383, 16384, 2_097_152])
+def test_multi_byte_delta(delta):
+    # Deltas en los bordes de 1, 2, 3 y 4 bytes de cantidad de longitud variable
+    notes = [make_note(60, 0, 1, 100), make_note(61, 1 + delta, 1, 100)]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert note_events(data) == [
+        (0, "note_on", 60, 100),
+        (1, "note_off", 60, 0),
+        (1 + delta, "note_on", 61, 100),
+        (2 + delta, "note_off", 61, 0),
+    ]
+
+
+def test_matches_mido_writer():
+    notes = [
+        make_note(60, 0, 128, 100),
+        make_note(64, 64, 16384, 70),
+        make_note(60, 128, 0, 50),
+        make_note(67, 20000, 300, 127),
+    ]
+    data = build_midi(notes, tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    # Reescribir con mido los mensajes leídos debe dar los mismos bytes
+    out = io.BytesIO()
+    parse(data).save(file=out)
+    assert out.getvalue() == data
+
+
+def test_note_array_same_bytes_as_list():
+    notes = [make_note(60, 0, 512, 100), make_note(64, 256, 512, 70), make_note(62, 2000, 10, 30)]
+
+    assert build_midi(NoteArray.from_notes(notes), TEMPO, TICKS_PER_BEAT) == build_midi(
+        notes, TEMPO, TICKS_PER_BEAT
+    )
+
+
+def test_generate_midi_writes_build_midi_bytes(tmp_path):
+    notes = [make_note(60, 0, 512, 100)]
+    path = generate_midi(notes, tmp_path / "out.mid", tempo=TEMPO, ticks_per_beat=TICKS_PER_BEAT)
+
+    assert path.read_bytes() == build_midi(notes, TEMPO, TICKS_PER_BEAT)
@@ -0,0 +1,48 @@
+"""Tests de detect_pitches con el salto de silencios (CREPE tiny en CPU)."""
+
+import numpy as np
+import pytest
+import torchcrepe.convert
+
+from src.audio.pitch_detector import detect_pitches
+from src.core.config import settings
+
+SR = 16000
+
+
+def tone(freq: float, seconds: float) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+@pytest.fixture
+def no_dither(monkeypatch):
+    """Sin el ruido aleatorio que torchcrepe suma al pitch, para comparar exacto."""
+    monkeypatch.setattr(torchcrepe.convert, "dither", lambda cents: cents)
+
+
+def detect(audio: np.ndarray, skip_silence: bool, monkeypatch):
+    monkeypatch.setattr(settings, "CREPE_SKIP_SILENCE", skip_silence)
+    return detect_pitches(audio, SR, model_size="tiny", device="cpu")
+
+
+def test_skip_silence_large_pitch_jump_across_gap(no_dither, monkeypatch):
+    # 80 Hz, 2 s de silencio y 900 Hz: ~44 semitonos entre frases, más de lo
+    # que Viterbi deja moverse al pitch en el hueco de margen entre tramos
+    audio = np.concatenate([tone(80.0, 1.0), np.zeros(2 * SR, np.float32), tone(900.0, 1.0)])
+
+    full = detect(audio, skip_silence=False, monkeypatch=monkeypatch)
+    skipped = detect(audio, skip_silence=True, monkeypatch=monkeypatch)
+
+    assert len(skipped) == len(full)
+    phrases = np.r_[5:95, 305:395]
+    np.testing.assert_allclose(skipped.frequency[phrases], full.frequency[phrases], rtol=1e-6)
+    np.testing.assert_allclose(skipped.confidence[phrases], full.confidence[phrases], rtol=1e-6)
+
+    # El final de la primera frase sigue en 80 Hz (no arrastrado hacia 900 Hz)
+    np.testing.assert_allclose(skipped.frequency[86:99], 80.0, rtol=0.02)
+    assert (skipped.confidence[86:99] > 0.5).all()
+
+    # El silencio lejos de las frases no pasa por CREPE
+    assert (skipped.frequency[120:280] == 0.0).all()
+    assert (skipped.confidence[120:280] == 0.0).all()
@@ -0,0 +1,43 @@
+"""Tests de la firma HMAC de webhooks."""
+
+import pytest
+
+from src.core import security
+
+PAYLOAD = {
+    "event": "job.completed",
+    "job_id": "job-123",
+    "data": {"notes_detected": 3, "key": "La menor"},
+}
+SECRET = "test-secret"
+
+# Bytes canónicos: compactos, keys ordenadas
+BODY = b'{"data":{"key":"La menor","notes_detected":3},"event":"job.completed","job_id":"job-123"}'
+SIGNATURE = "sha256=78f236217ab8675bbc3438ec643246e7349b8b15b0b92f757337776846a30d29"
+
+
+@pytest.fixture(params=["orjson", "json"])
+def serializer(request, monkeypatch):
+    """Corre cada test con orjson y con el fallback de la stdlib."""
+    if request.param == "json":
+        monkeypatch.setattr(security, "orjson", None)
+    return request.param
+
+
+def test_serialize_webhook_payload_canonical_bytes(serializer):
+    assert security.serialize_webhook_payload(PAYLOAD) == BODY
+
+
+def test_serialize_webhook_payload_utf8_unescaped(serializer):
+    body = security.serialize_webhook_payload({"key": "Do mayor ñ"})
+    assert body == '{"key":"Do mayor ñ"}'.encode()
+
+
+def test_sign_webhook_body_known_hmac():
+    assert security.sign_webhook_body(BODY, SECRET) == SIGNATURE
+
+
+def test_generate_and_verify_signature(serializer):
+    assert security.generate_webhook_signature(PAYLOAD, SECRET) == SIGNATURE
+    assert security.verify_webhook_signature(PAYLOAD, SIGNATURE, SECRET)
+    assert not security.verify_webhook_signature(PAYLOAD, SIGNATURE, "otro-secret")